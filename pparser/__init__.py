@@ -1 +1,3 @@
 __version__ = '2.0.2'
+
+from .api import compile, Result
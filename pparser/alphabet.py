@@ -0,0 +1,262 @@
+"""File containing the loader of alphabets of Alt codes
+"""
+
+from hashlib import sha256
+from json import JSONDecodeError, load
+from pathlib import Path
+import marshal
+import os
+
+from .exceptions import AlphabetError
+from .utils import cache_dir, check_file, log_info
+
+
+# Alphabets supplied by default
+default_alphabets = sorted((Path(__file__).parent / 'alphabets').glob('*.json'))
+
+
+def _merge(paths):
+    """Merges alphabets in the specified order. Later alphabets override Alt
+    codes of the same characters in the former ones
+
+    Args:
+        paths (List[pathlib.Path]): paths to alphabets
+
+    Returns:
+        Tuple[dict, list]: merged alphabet and list of overrides in format
+            ``(path, character, old_code, new_code)``
+
+    Raises:
+        AlphabetError: the alphabet is malformed
+    """
+    alphabet = {}
+    overrides = []
+
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as file:
+                codes = load(file)
+        except (JSONDecodeError, UnicodeDecodeError) as e:
+            raise AlphabetError(f'Alphabet `{path}` is malformed: {e}')
+
+        if not isinstance(codes, dict) or not all(
+            len(c) == 1 and isinstance(code, int) and 0 < code < 65536 for c, code in codes.items()
+        ):
+            raise AlphabetError(f'Alphabet `{path}` is malformed: expected JSON object of characters and their Alt codes')
+
+        for c, code in codes.items():
+            old_code = alphabet.get(c)
+
+            if old_code is not None and old_code != code:
+                overrides.append((str(path), c, old_code, code))
+
+            alphabet[c] = code
+
+    return alphabet, overrides
+
+
+def load_alphabet(paths, log=log_info, cache=True):
+    """Generates alphabet dictionary of Alt codes from the alphabets supplied
+    by default and specified by the user. The merged alphabet is cached in
+    the compact form, cache is invalidated if any alphabet was changed (by
+    modification time and size of the files)
+
+    Args:
+        paths (List[pathlib.Path]): paths to additional alphabets
+        log (Callable[[str], None]): function which logs overridden characters
+        cache (bool): whether the merged alphabet is cached in the user cache
+            directory, otherwise alphabets are only read
+
+    Returns:
+        dict: mapping of characters to their Alt codes
+
+    Raises:
+        AlphabetError: one of alphabets is malformed
+    """
+    # Don't forget to check if files are already exist
+    for path in paths:
+        check_file(path)
+
+    paths = default_alphabets + list(paths)
+
+    alphabet, overrides = _load_cached(paths) if cache else _merge(paths)
+
+    # Report characters which are silently overridden by the later alphabets
+    for path, c, old_code, new_code in overrides:
+        log(f'Alphabet `{path}` overrides Alt code of `{c}` ({old_code} -> {new_code})')
+
+    return alphabet
+
+
+def _load_cached(paths):
+    """Merges alphabets (see :func:`_merge`) or loads the merged alphabet
+    from the cache
+
+    Returns:
+        Tuple[dict, list]: merged alphabet and list of overrides
+    """
+    # Name of the cache depends on the order of alphabets, while its content
+    # is validated by the state of files
+    names = [str(path.absolute()) for path in paths]
+    signature = [(stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, paths)]
+    cache = cache_dir() / f'alphabet-{sha256(marshal.dumps(names)).hexdigest()[:16]}.marshal'
+
+    try:
+        with open(cache, 'rb') as file:
+            cached_signature, alphabet, overrides = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        cached_signature = None
+
+    # Some alphabet was changed since it was cached
+    if cached_signature != signature:
+        alphabet, overrides = _merge(paths)
+
+        # The cache is written atomically, so parallel parsers never read
+        # it partially
+        tmp = cache.with_suffix(f'.{os.getpid()}.tmp')
+
+        try:
+            os.makedirs(cache.parent, exist_ok=True)
+
+            with open(tmp, 'wb') as file:
+                marshal.dump((signature, alphabet, overrides), file)
+
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+
+    return alphabet, overrides
+
+
+class AltTranslator:
+    """Translates strings to Alt codes and renders them to C++ in bulk. Each
+    character is mapped to its Alt code or to the ready rendered fragment of
+    the sequence, so translation is done by one :meth:`str.translate` call
+
+    Sequences can be rendered in several encodings (see :mod:`pparser.encodings`):
+
+    - *u16*: 16-bit Alt codes, e.g. ``72_S, 105_S``
+    - *u8*: 8-bit Alt codes, e.g. ``72, 105``. It's possible only if all
+      codes of the alphabet are less than 256
+    - *keys*: keypad keys of Alt codes digits, each code is terminated by 0,
+      e.g. ``231, 226, 0, 225, 234, 229, 0``
+
+    Args:
+        alphabet (dict): mapping of characters to their Alt codes
+        encoding (str): encoding of sequences, *auto* chooses *u8* if it's
+            possible and *u16* otherwise. Sequences are rendered while parsing,
+            so it's chosen by all codes of the alphabet, not only used ones
+
+    Raises:
+        AlphabetError: *u8* is chosen, but the alphabet has larger codes
+    """
+
+    def __init__(self, alphabet, encoding='u16'):
+        self.charset = frozenset(alphabet)
+        self.codes_table = {ord(c): code for c, code in alphabet.items()}
+
+        # Whether all printable ASCII characters are defined, then ASCII
+        # strings can be translated without validation
+        self.ascii = all(chr(i) in self.charset for i in range(32, 127))
+
+        codes = set(alphabet.values())
+
+        # Whether all codes fit in 8 bits
+        self.u8 = all(code < 256 for code in codes)
+
+        if encoding == 'u8' and not self.u8:
+            c, code = max(alphabet.items(), key=lambda item: item[1])
+            raise AlphabetError(f'Alt codes don\'t fit in 8 bits (e.g. `{c}` is {code}), so `u8` encoding can\'t be used')
+
+        if encoding in ('auto', 'u8') and self.u8:
+            self.encoding = 'u8'
+        elif encoding == 'keys':
+            self.encoding = 'keys'
+        else:
+            self.encoding = 'u16'
+
+        if self.encoding == 'u16':
+            self.table = {code: f'{code}_S, ' for code in codes}
+        elif self.encoding == 'u8':
+            self.table = {code: f'{code}, ' for code in codes}
+        else:
+            # Keypad keys of digits, `0` is the last one
+            keys = dict(zip('1234567890', range(225, 235)))
+            self.table = {code: ''.join(f'{keys[d]}, ' for d in str(code)) + '0, ' for code in codes}
+
+        # Plain codes or keys, which can be stored in the array in flash memory
+        self.data_table = {code: fragment.replace('_S', '') for code, fragment in self.table.items()}
+
+        # Number of digits of each code, it's used only for the statistics
+        self.digits_table = {code: '0' * len(str(code)) for code in codes}
+
+        # Number of rendered strings, characters and digits, they are
+        # counted if it's a list (see `pparser.encodings.report`)
+        self.stats = None
+
+    def missing(self, text):
+        """Finds all characters of the text which aren't defined in the
+        alphabet in one pass
+
+        Args:
+            text (str): text to check
+
+        Returns:
+            List[Tuple[int, str]]: positions (starting from 1) and undefined
+                characters, empty list if all characters are defined
+        """
+        if self.ascii and text.isascii() and text.isprintable():
+            return []
+
+        missing = set(text) - self.charset
+
+        if not missing:
+            return []
+
+        return [(i + 1, c) for i, c in enumerate(text) if c in missing]
+
+    def translate(self, text):
+        """Translates the text to Alt codes. All characters must be defined
+        (see :meth:`missing`)
+
+        Args:
+            text (str): text to translate
+
+        Returns:
+            str: Alt codes stored as characters with such code points
+                (see :class:`pparser.ir.TypeAlt`)
+        """
+        return text.translate(self.codes_table)
+
+    def count(self, codes):
+        """Adds the codes to the statistics, if they are collected
+        """
+        if self.stats is not None:
+            self.stats[0] += 1
+            self.stats[1] += len(codes)
+            self.stats[2] += len(codes.translate(self.digits_table))
+
+    def render(self, codes):
+        """Renders Alt codes to the sequence in the chosen encoding
+
+        Args:
+            codes (str): Alt codes returned by :meth:`translate`
+
+        Returns:
+            str: comma separated items of the sequence, e.g. ``72_S, 105_S``
+        """
+        self.count(codes)
+        return codes.translate(self.table)[:-2]
+
+    def render_data(self, codes):
+        """Renders Alt codes to the sequence in the chosen encoding, which
+        can be stored in the array in flash memory
+
+        Args:
+            codes (str): Alt codes returned by :meth:`translate`
+
+        Returns:
+            str: comma separated items of the sequence, e.g. ``72, 105``
+        """
+        self.count(codes)
+        return codes.translate(self.data_table)[:-2]
@@ -0,0 +1,156 @@
+"""File containing the library interface of PotatoParser. Unlike the
+command-line interface, it works in memory, never exits the process and
+can be used from several threads at once
+"""
+
+from argparse import Namespace
+from io import StringIO
+from pathlib import Path
+from threading import Lock
+
+from .alphabet import load_alphabet
+from .diagnostics import Diagnostic
+from .exceptions import AlphabetError, LayoutError, ParsingAborted
+from .layout import layout_path
+from .parser import PotatoParser
+
+
+# Default values of the parser options
+_defaults = None
+
+# Alphabet supplied by default, it's loaded once per process
+_default_alphabet = None
+_default_alphabet_lock = Lock()
+
+
+class Result:
+    """Result of the script parsing
+
+    Args:
+        sketch (str): text of the generated sketch, empty if parsing was aborted
+        success (bool): whether the script was parsed without errors
+        diagnostics (List[pparser.diagnostics.Diagnostic]): errors and
+            warnings, those which aren't related to a line of the script
+            (e.g. missing alphabet) have no line
+        lines (int): number of parsed lines
+    """
+
+    def __init__(self, sketch, success, diagnostics, lines):
+        self.sketch = sketch
+        self.success = success
+        self.diagnostics = diagnostics
+        self.lines = lines
+
+    def __repr__(self):
+        return f'<Result success={self.success} lines={self.lines} diagnostics={len(self.diagnostics)}>'
+
+
+def _get_options(options, kwargs):
+    """Combines options of the parser with defaults of the command-line
+    interface
+
+    Returns:
+        argparse.Namespace: parser options
+    """
+    global _defaults
+
+    if _defaults is None:
+        from .main import build_arg_parser
+        _defaults = vars(build_arg_parser().parse_args(['-']))
+
+    if isinstance(options, Namespace):
+        options = vars(options)
+
+    args = Namespace(**{**_defaults, **(options or {}), **kwargs})
+
+    # Sketch is always generated in memory
+    args.output = None
+    args.profile = None
+    args.cache = None
+
+    args.alphabets = [Path(path) for path in args.alphabets]
+    return args
+
+
+def _get_alphabet(args, diagnostics):
+    """Loads alphabet required by the options
+
+    Returns:
+        Union[dict, None]: alphabet or ``None`` if it can't be loaded
+    """
+    global _default_alphabet
+
+    def log(msg):
+        diagnostics.append(Diagnostic('info', 'W100', None, None, msg))
+
+    if args.disable_alt:
+        return None
+
+    for path in args.alphabets:
+        if not path.is_file():
+            diagnostics.append(Diagnostic('error', 'E100', None, None, f"File `{path}` doesn't exist"))
+            return None
+
+    # The merged alphabet isn't cached on disk, the library never writes
+    # to the filesystem
+    try:
+        if args.alphabets:
+            return load_alphabet(args.alphabets, log, cache=False)
+
+        with _default_alphabet_lock:
+            if _default_alphabet is None:
+                _default_alphabet = load_alphabet([], log, cache=False)
+    except AlphabetError as e:
+        diagnostics.append(Diagnostic('error', e.code, None, None, str(e)))
+        return None
+
+    return _default_alphabet
+
+
+def compile(source, options=None, **kwargs):
+    """Parses Ducky Script to the Arduino sketch in memory
+
+    Args:
+        source (Union[str, Iterable[str]]): text of the script or its lines
+        options (Optional[Union[argparse.Namespace, dict]]): parser options,
+            the same as the command-line options (e.g. ``error_ok``, ``indent``,
+            ``disable_alt``, ``alphabets``). Missing options have their
+            default values
+        **kwargs: options can also be specified as keyword arguments
+
+    Returns:
+        Result: generated sketch and diagnostics
+    """
+    args = _get_options(options, kwargs)
+    diagnostics = []
+
+    alphabet = _get_alphabet(args, diagnostics)
+
+    if alphabet is None and not args.disable_alt:
+        return Result('', False, diagnostics, 0)
+
+    if args.layout and not args.disable_alt and not layout_path(args.layout).is_file():
+        diagnostics.append(Diagnostic('error', 'E100', None, None, f"File `{layout_path(args.layout)}` doesn't exist"))
+        return Result('', False, diagnostics, 0)
+
+    try:
+        pparser = PotatoParser(args, alphabet)
+    except (AlphabetError, LayoutError) as e:
+        diagnostics.append(Diagnostic('error', e.code, None, None, str(e)))
+        return Result('', False, diagnostics, 0)
+
+    if isinstance(source, str):
+        # Lines are split in the same way as lines of the file
+        source = StringIO(source, newline=None)
+
+    try:
+        for line in source:
+            pparser.exec_line(line)
+    except ParsingAborted:
+        diagnostics.extend(pparser.diagnostics)
+        return Result('', False, diagnostics, pparser.i)
+
+    pparser.sketch.flush()
+    diagnostics.extend(pparser.diagnostics)
+
+    return Result(pparser.sketch.getvalue(), pparser.is_success, diagnostics, pparser.i)
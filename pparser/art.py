@@ -1,14 +1,15 @@
 """File contains a function that generates an ASCII banner
 """
 
-from colorama import init, Style, Fore
-from packaging.version import parse
-from requests import get
-
-from . import __version__
+from json import dump, load
+from threading import Thread
+from time import time
+import os
 
+from colorama import Style, Fore
 
-init()
+from . import __version__
+from .utils import cache_dir
 
 
 # Define color aliases
@@ -20,6 +21,13 @@ Y = Style.RESET_ALL + Style.BRIGHT + Fore.YELLOW    # Yellow
 R = Style.RESET_ALL                                 # Reset
 
 
+# Time in seconds while the fetched remote version is valid
+VERSION_TTL = 24 * 60 * 60
+
+# Background thread updating the cached remote version
+_version_thread = None
+
+
 def _get_remote_version():
     """Function returns the latest version of the parser published on PyPI.
     Request is limited in time in ~100ms
@@ -29,6 +37,10 @@ def _get_remote_version():
             remote version, otherwise **0.0.0**
     """
     try:
+        # Heavy modules are imported only when they are really needed
+        from packaging.version import parse
+        from requests import get
+
         r = get('https://pypi.org/pypi/pparser/json', timeout=0.1)
         return max(r.json()['releases'], key=lambda x: parse(x))
 
@@ -36,9 +48,86 @@ def _get_remote_version():
         return '0.0.0'
 
 
-def gen_art():
+def _save_remote_version(version):
+    """Saves the remote version to the cache
+
+    Args:
+        version (str): the latest remote version
+    """
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+
+        with open(cache_dir() / 'version.json', 'w') as file:
+            dump({'version': version, 'time': time()}, file)
+    except OSError:
+        pass
+
+
+def _update_remote_version():
+    """Fetches the latest remote version and saves it to the cache
+    """
+    version = _get_remote_version()
+
+    if version != '0.0.0':
+        _save_remote_version(version)
+
+
+def check_updates_enabled():
+    """Checking for updates can be disabled with the ``PPARSER_NO_UPDATE_CHECK``
+    environment variable
+
+    Returns:
+        bool: whether checking for updates is enabled
+    """
+    return not os.environ.get('PPARSER_NO_UPDATE_CHECK')
+
+
+def get_remote_version():
+    """Returns the latest remote version from the cache. If the cached version is
+    outdated, it's updated in the background, so the network is never waited
+
+    Returns:
+        str: the latest remote version or **0.0.0** if it's unknown
+    """
+    global _version_thread
+
+    try:
+        with open(cache_dir() / 'version.json') as file:
+            cached = load(file)
+
+        if time() - cached['time'] < VERSION_TTL:
+            return cached['version']
+    except (OSError, ValueError, KeyError, TypeError):
+        cached = {'version': '0.0.0'}
+
+    # Postpone the next check even if this one fails (e.g. the network
+    # is isolated), it will be overwritten by the fetched version
+    _save_remote_version(cached['version'])
+
+    if _version_thread is None:
+        _version_thread = Thread(target=_update_remote_version, daemon=True)
+        _version_thread.start()
+
+    return cached['version']
+
+
+def wait_remote_version(timeout=0.2):
+    """Gives the background update of the remote version a chance to finish
+    before exit
+
+    Args:
+        timeout (float): maximum time to wait in seconds
+    """
+    if _version_thread is not None:
+        _version_thread.join(timeout)
+
+
+def gen_art(check_updates=True):
     """The main function generating the ASCII banner
 
+    Args:
+        check_updates (bool): whether to show the available update
+
     Returns:
         str: colored ASCII banner
     """
@@ -73,12 +162,18 @@ def gen_art():
         .replace('R', R)
 
     # Adding dynamic information
-    remote_version = _get_remote_version()
-
-    if parse(remote_version) > parse(__version__):
-        new_update = f'{C}available ({remote_version})'
+    if check_updates and check_updates_enabled():
+        remote_version = get_remote_version()
     else:
-        new_update = f'{W}unavailable'
+        remote_version = '0.0.0'
+
+    new_update = f'{W}unavailable'
+
+    if remote_version != '0.0.0':
+        from packaging.version import parse
+
+        if parse(remote_version) > parse(__version__):
+            new_update = f'{C}available ({remote_version})'
 
     return art.format(
         f'{Y}PotatoParser{W} by YariKartoshe4ka{R}',
@@ -0,0 +1,260 @@
+"""File containing the benchmark suite of PotatoParser. Run it with
+``pparser bench``
+"""
+
+from argparse import ArgumentParser
+from json import dump, load
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import re
+import subprocess
+import sys
+
+from colorama import init
+
+from .utils import log_error, log_info, log_success
+
+
+# Commands of the synthetic scripts and their weights
+_mix = (
+    ('string', 25),
+    ('cyrillic', 15),
+    ('delay', 15),
+    ('single', 20),
+    ('combo', 10),
+    ('stringdelay', 5),
+    ('repeat', 5),
+    ('rem', 5)
+)
+
+_words = ('hello', 'world', 'notepad', 'powershell', 'echo', 'payload', 'Get-Process', 'cmd.exe', '123', 'C:\\Users')
+_cyrillic = ('привет', 'мир', 'блокнот', 'Строка', 'ЁЖИК', 'тест')
+_single = ('ENTER', 'TAB', 'DOWN', 'UP', 'ESC', 'SPACE', 'BACKSPACE', 'F5')
+_combo = ('CTRL c', 'CTRL v', 'GUI r', 'ALT F4', 'CTRL ALT DELETE', 'SHIFT TAB', 'CTRL SHIFT ESC')
+
+
+def generate_script(lines, seed=0):
+    """Generates deterministic synthetic Ducky Script with a realistic mix
+    of commands
+
+    Args:
+        lines (int): number of lines in the script
+        seed (int): seed of the random generator
+
+    Yields:
+        str: lines of the script
+    """
+    random = Random(seed)
+    kinds = [kind for kind, _ in _mix]
+    weights = [weight for _, weight in _mix]
+    prev = 'rem'
+
+    yield 'DEFAULTDELAY 20\n'
+
+    for _ in range(lines - 1):
+        kind = random.choices(kinds, weights)[0]
+
+        # `REPEAT` can't repeat comments and itself
+        if kind == 'repeat' and prev in ('rem', 'repeat'):
+            kind = 'delay'
+
+        if kind == 'string':
+            yield 'STRING ' + ' '.join(random.choices(_words, k=random.randint(1, 12))) + '\n'
+        elif kind == 'cyrillic':
+            yield 'STRING ' + ' '.join(random.choices(_cyrillic + _words, k=random.randint(1, 12))) + '\n'
+        elif kind == 'delay':
+            yield f'DELAY {random.randint(1, 1000)}\n'
+        elif kind == 'single':
+            yield random.choice(_single) + '\n'
+        elif kind == 'combo':
+            yield random.choice(_combo) + '\n'
+        elif kind == 'stringdelay':
+            yield f'STRINGDELAY {random.randint(1, 100)} ' + ' '.join(random.choices(_words, k=3)) + '\n'
+        elif kind == 'repeat':
+            yield f'REPEAT {random.randint(1, 10)}\n'
+        else:
+            yield 'REM ' + ' '.join(random.choices(_words, k=5)) + '\n'
+
+        prev = kind
+
+
+def _peak_rss():
+    """Returns peak resident set size of the current process in megabytes or
+    ``None`` if it can't be measured on this platform
+    """
+    try:
+        from resource import getrusage, RUSAGE_SELF
+    except ImportError:
+        return None
+
+    rss = getrusage(RUSAGE_SELF).ru_maxrss
+    return round(rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def run_case(lines, seed=0):
+    """Parses a synthetic script and measures time of each phase. It should
+    be run in a fresh process to measure peak memory usage correctly
+
+    Args:
+        lines (int): number of lines in the script
+        seed (int): seed of the random generator
+
+    Returns:
+        dict: results of the case
+    """
+    from .alphabet import load_alphabet
+    from .main import build_arg_parser
+    from .parser import PotatoParser
+
+    with TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'script.txt'
+
+        with open(source, 'w', encoding='utf-8') as file:
+            file.writelines(generate_script(lines, seed))
+
+        args = build_arg_parser().parse_args(['-q', '-e', '-o', str(Path(tmp) / 'sketch'), str(source)])
+        phases = {}
+
+        start = perf_counter()
+        alphabet = load_alphabet(args.alphabets)
+        phases['alphabet'] = perf_counter() - start
+
+        start = perf_counter()
+        pparser = PotatoParser(args, alphabet)
+
+        with open(source, encoding='utf-8') as file:
+            for line in file:
+                pparser.exec_line(line)
+
+        phases['parse'] = perf_counter() - start
+
+        start = perf_counter()
+        pparser.sketch.flush()
+        pparser.sketch.file.close()
+        phases['flush'] = perf_counter() - start
+
+    total = sum(phases.values())
+
+    return {
+        'lines': lines,
+        'seconds': round(total, 4),
+        'lines_per_second': round(lines / total),
+        'peak_rss_mb': _peak_rss(),
+        'phases': {phase: round(seconds, 4) for phase, seconds in phases.items()}
+    }
+
+
+def run_startup():
+    """Measures import time of the command-line interface in a fresh
+    interpreter (``python -X importtime -m pparser -q``)
+
+    Returns:
+        dict: results of the case
+    """
+    r = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'pparser', '-q'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True
+    )
+
+    # Cumulative time of the top-level package, in microseconds
+    times = re.findall(r'\|\s*(\d+) \| pparser(?:\.main)?$', r.stderr, re.M)
+
+    return {'import_ms': round(max(map(int, times), default=0) / 1000, 1)}
+
+
+def compare(results, baseline, threshold):
+    """Compares results with the baseline
+
+    Args:
+        results (dict): results of the current run
+        baseline (dict): results of the baseline run
+        threshold (float): allowed relative regression, e.g. 0.2 for 20%
+
+    Returns:
+        List[str]: descriptions of regressions
+    """
+    regressions = []
+    cases = {case['lines']: case for case in baseline.get('cases', [])}
+
+    for case in results['cases']:
+        base = cases.get(case['lines'])
+
+        if base is None:
+            continue
+
+        if case['lines_per_second'] < base['lines_per_second'] * (1 - threshold):
+            regressions.append(f'{case["lines"]} lines: {case["lines_per_second"]} lines/s < {base["lines_per_second"]} lines/s')
+
+        if case['peak_rss_mb'] and base.get('peak_rss_mb') and case['peak_rss_mb'] > base['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f'{case["lines"]} lines: peak RSS {case["peak_rss_mb"]}MB > {base["peak_rss_mb"]}MB')
+
+    base = baseline.get('startup')
+
+    if base and results['startup']['import_ms'] > base['import_ms'] * (1 + threshold):
+        regressions.append(f'startup: import {results["startup"]["import_ms"]}ms > {base["import_ms"]}ms')
+
+    return regressions
+
+
+def main(argv=sys.argv[1:]):
+    """Entrypoint of the benchmark suite
+
+    Args:
+        argv (Optional[list]): benchmark options
+    """
+    parser = ArgumentParser(prog='pparser bench', description='Benchmark of PotatoParser on synthetic Ducky Scripts')
+
+    parser.add_argument('--sizes', type=int, metavar='LINES', nargs='+', default=[1000, 10000, 100000], help='sizes of synthetic scripts in lines (defaults to 1000 10000 100000)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the script generator')
+    parser.add_argument('-o', dest='output', type=Path, metavar='OUTPUT', help='path to JSON file to save results')
+    parser.add_argument('--baseline', type=Path, metavar='BASELINE', help='path to JSON file with results to compare with')
+    parser.add_argument('--threshold', type=float, metavar='RATIO', default=0.2, help='allowed relative regression against the baseline (defaults to 0.2)')
+    parser.add_argument('--startup-budget', type=float, metavar='MS', default=100, help='maximum import time of the command-line interface (defaults to 100ms)')
+
+    args = parser.parse_args(argv)
+
+    init()
+
+    # Each case is run in a fresh process, so peak memory isn't shared
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    results = {'cases': []}
+
+    for lines in args.sizes:
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as executor:
+            case = executor.submit(run_case, lines, args.seed).result()
+
+        results['cases'].append(case)
+        phases = ', '.join(f'{phase} {round(seconds * 1000)}ms' for phase, seconds in case['phases'].items())
+        log_info(f'{lines} lines: {case["lines_per_second"]} lines/s, peak RSS {case["peak_rss_mb"]}MB ({phases})')
+
+    results['startup'] = run_startup()
+    log_info(f'startup: import {results["startup"]["import_ms"]}ms')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            dump(results, file, indent=4)
+
+    failures = []
+
+    if results['startup']['import_ms'] > args.startup_budget:
+        failures.append(f'startup: import {results["startup"]["import_ms"]}ms exceeds budget of {args.startup_budget}ms')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            failures += compare(results, load(file), args.threshold)
+
+    for failure in failures:
+        log_error(f'Regression: {failure}')
+
+    if failures:
+        sys.exit(1)
+
+    log_success('Benchmark passed')
+
+
+if __name__ == '__main__':
+    main()
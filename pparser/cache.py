@@ -0,0 +1,288 @@
+"""File containing the persistent cache used for incremental parsing
+"""
+
+from hashlib import sha256
+from json import dumps
+import hmac
+import os
+import pickle
+
+from . import __version__
+from .utils import cache_dir
+
+
+# Length of the secret key and signatures of checkpoints in bytes
+_digest_size = sha256().digest_size
+
+
+def _secret():
+    """Returns the secret key of the user, which signs checkpoints. It's
+    generated on the first use and readable only by the user
+
+    Returns:
+        bytes: the key
+    """
+    path = cache_dir() / 'secret'
+
+    try:
+        with open(path, 'rb') as file:
+            secret = file.read()
+
+        if len(secret) == _digest_size:
+            return secret
+    except OSError:
+        pass
+
+    secret = os.urandom(_digest_size)
+    os.makedirs(path.parent, mode=0o700, exist_ok=True)
+
+    # The key is written atomically, so a parallel parser never reads it
+    # partially (at worst its checkpoints are just not reused)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+
+    with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+        file.write(secret)
+
+    os.replace(tmp, path)
+    return secret
+
+
+class CompilationCache:
+    """On-disk cache of parser checkpoints. Every :attr:`interval` lines the
+    state of the parser and the code generated since the previous checkpoint
+    are saved. The checkpoint is keyed by hash of the source prefix and parser
+    options, so the next parsing of the changed script resumes from the last
+    checkpoint before the first changed line
+
+    Checkpoints are pickled, so each of them is signed by HMAC with the secret
+    key of the user (see :func:`_secret`). Checkpoints written by anyone else
+    (e.g. to the shared directory) are never unpickled
+
+    Args:
+        directory (pathlib.Path): path to the cache directory
+        size (int): maximum size of the cache in bytes, the least recently
+            used checkpoints are removed when it's exceeded
+    """
+
+    # Number of lines between checkpoints
+    interval = 1000
+
+    def __init__(self, directory, size):
+        self.directory = directory
+        self.size = size
+        self.secret = _secret()
+
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, key):
+        return self.directory / (key + '.pickle')
+
+    def _sign(self, key, data):
+        return hmac.new(self.secret, key.encode() + data, sha256).digest()
+
+    def _entries(self):
+        return [path for path in self.directory.iterdir() if path.suffix == '.pickle']
+
+    def load(self, key):
+        """Loads checkpoint and marks it as recently used
+
+        Args:
+            key (str): key of the checkpoint
+
+        Returns:
+            Union[dict, None]: checkpoint or ``None``, if it doesn't exist or
+                its signature is invalid
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, 'rb') as file:
+                signature = file.read(_digest_size)
+                data = file.read()
+
+            # The key is signed too, so checkpoints can't be swapped
+            if not hmac.compare_digest(signature, self._sign(key, data)):
+                return None
+
+            entry = pickle.loads(data)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+        return entry
+
+    def store(self, key, entry):
+        """Atomically saves checkpoint, so parallel parsers can share the cache
+
+        Args:
+            key (str): key of the checkpoint
+            entry (dict): checkpoint
+        """
+        path = self._path(key)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+
+        with open(tmp, 'wb') as file:
+            file.write(self._sign(key, data))
+            file.write(data)
+
+        os.replace(tmp, path)
+
+    def clear(self):
+        """Removes all checkpoints from the cache
+        """
+        for path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def trim(self):
+        """Removes the least recently used checkpoints until the cache fits
+        into the size limit
+        """
+        entries = []
+
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.size:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            total -= size
+
+    @staticmethod
+    def options_key(pparser):
+        """Generates key of the parser options which affect the output sketch
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+
+        Returns:
+            str: hash of the options
+        """
+        args = pparser.args
+        alphabet = None if args.disable_alt else sorted(pparser.alphabet.items())
+
+        return sha256(dumps([
+            __version__,
+            alphabet,
+            args.disable_alt,
+            args.indent,
+            args.error_ok,
+            args.progmem,
+            args.specialize,
+            None if pparser.layout is None else [pparser.layout.direct, pparser.layout.shift],
+            None if args.disable_alt else pparser.translator.encoding,
+            args.encoding_report,
+            args.optimize,
+            args.compress_loops,
+            pparser.estimator is not None and vars(pparser.estimator.model),
+            # Only this number of the slowest lines is kept in checkpoints
+            pparser.estimator is not None and pparser.estimator.top
+        ]).encode()).hexdigest()
+
+    def _start_segment(self, pparser):
+        """Starts recording of the output and diagnostics, which are saved
+        in the next checkpoint
+        """
+        pparser.sketch.record = []
+        pparser.sketch.record_data = []
+        self._diagnostics = len(pparser.diagnostics)
+
+    def _checkpoint(self, pparser, key):
+        self.store(key, {
+            'state': pparser.get_state(),
+            'body': ''.join(pparser.sketch.record),
+            'data': ''.join(pparser.sketch.record_data),
+            'diagnostics': pparser.diagnostics.items[self._diagnostics:]
+        })
+
+        self._start_segment(pparser)
+
+    def restore(self, pparser, state):
+        """Restores the state of the parser saved in the checkpoint
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+            state (dict): state of the parser (see :meth:`pparser.parser.PotatoParser.get_state`)
+        """
+        pparser.set_state(state)
+
+    def compile(self, pparser, source):
+        """Feeds the lines of the script to the parser. Lines covered by valid
+        checkpoints aren't parsed, their output is taken from the cache
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+            source (Iterable[str]): lines of the script
+        """
+        hasher = sha256(self.options_key(pparser).encode())
+
+        # Lines of the current segment, while checkpoints are valid
+        lines = []
+        state = None
+        resuming = True
+
+        for line in source:
+            hasher.update(line.encode())
+
+            if resuming:
+                lines.append(line)
+
+                if len(lines) < self.interval:
+                    continue
+
+                entry = self.load(hasher.hexdigest())
+
+                if entry is not None:
+                    # Replay output of the cached segment
+                    pparser.sketch.add_rendered(entry['body'])
+                    pparser.sketch.add_rendered_data(entry['data'])
+
+                    state = entry['state']
+                    pparser.diagnostics.extend(entry['diagnostics'])
+
+                    lines = []
+                    continue
+
+                # The first changed segment, so resume from the last checkpoint.
+                # Replayed output is already in the cached checkpoints, so it
+                # isn't recorded to the next one
+                resuming = False
+                self._start_segment(pparser)
+
+                if state is not None:
+                    self.restore(pparser, state)
+
+                for segment_line in lines:
+                    pparser.exec_line(segment_line)
+            else:
+                pparser.exec_line(line)
+
+            if pparser.i % self.interval == 0:
+                self._checkpoint(pparser, hasher.hexdigest())
+
+        # The tail of the script is shorter than the interval
+        if resuming:
+            if state is not None:
+                self.restore(pparser, state)
+
+            for line in lines:
+                pparser.exec_line(line)
+
+        pparser.sketch.record = None
+        pparser.sketch.record_data = None
@@ -0,0 +1,268 @@
+"""File containing the parallel parsing of one script split to chunks
+"""
+
+from argparse import Namespace
+from collections import deque
+from itertools import islice
+
+from .commands import get_command
+from .exceptions import PotatoParserError, PotatoParserWarning
+
+
+# Parser of the worker process, see `_init_worker`
+_parser = None
+
+
+def _init_worker(args, alphabet):
+    """Initializer of the workers, each of them has its own parser, which
+    executes commands of chunks
+
+    Args:
+        args (argparse.Namespace): parser options
+        alphabet (Union[dict, None]): already loaded alphabet of Alt codes
+    """
+    global _parser
+
+    # Imported here, because the parser imports this module
+    from .parser import PotatoParser
+
+    # The sketch is generated in memory and only commands are executed, so
+    # optimizers and the estimator aren't needed
+    _parser = PotatoParser(Namespace(**{
+        **vars(args),
+        'output': None,
+        'chunk_size': None,
+        'optimize': 0,
+        'compress_loops': False,
+        'estimate': None,
+        'max_runtime': None,
+        'specialize': False
+    }), alphabet)
+
+
+def _parse_chunk(lines, stats, render, nodes):
+    """Executes independent commands of the chunk (see :attr:`pparser.commands.DuckyCommand.independent`)
+
+    Args:
+        lines (List[str]): lines of the chunk
+        stats (bool): whether statistics of Alt codes are collected
+        render (bool): whether generated nodes are rendered too
+        nodes (bool): whether generated nodes are always returned, otherwise
+            they are returned only if they can be repeated by the following
+            commands (nodes are much slower to transfer than rendered text)
+
+    Returns:
+        Tuple[list, Union[List[int], None]]: result of each line and statistics
+            of Alt codes. Result is ``None`` if the command must be executed by
+            the stitch pass, otherwise it's a tuple of generated nodes, raised
+            error, rendered text and required payloads
+    """
+    pparser = _parser
+    sketch = pparser.sketch
+    emitter = pparser.emitter
+    results = []
+
+    # Indexes of lines with commands (including undefined ones) and indexes
+    # of commands, which are executed by the stitch pass and can look back
+    # through the history of the parser
+    commands = []
+    dependent = []
+
+    if stats:
+        pparser.translator.stats = [0, 0, 0]
+
+    for line in lines:
+        cmd, *arg = line.rstrip().split(' ', 1)
+        command = get_command(cmd) if cmd else None
+
+        if cmd:
+            commands.append(len(results))
+
+        if command is None or not command.independent:
+            if command is not None:
+                dependent.append(len(commands) - 1)
+
+            results.append(None)
+            continue
+
+        try:
+            out = command(arg[0] if arg else None, pparser).exec()
+        except (PotatoParserWarning, PotatoParserError) as e:
+            results.append((None, e, None, ()))
+            continue
+
+        text = None
+
+        # Payloads are collected for each line separately, because the
+        # rendered text can be not used
+        if render and out:
+            sketch.payloads = set()
+            text = '\n'.join(sketch.make_indents(emitter.render(out), 1)) + '\n'
+
+        results.append((out, None, text, tuple(sketch.payloads) if text else ()))
+
+    if not nodes:
+        # Commands can look back only through the history of the parser, so
+        # only nodes of the last commands of the chunk and of the commands
+        # before dependent ones are needed
+        history = pparser.processed_commands.maxlen
+        needed = set()
+
+        for end in (*dependent, len(commands)):
+            needed.update(commands[max(end - history, 0):end])
+
+        for i, result in enumerate(results):
+            if result is not None and result[2] is not None and i not in needed:
+                results[i] = (None, *result[1:])
+
+    return results, pparser.translator.stats if stats else None
+
+
+class ChunkedParser:
+    """Parses one script in parallel. The script is split to chunks of
+    **chunk_size** lines, independent commands of each chunk are parsed,
+    translated and rendered in the worker process. Then the stitch pass
+    feeds lines to the parser sequentially, as usual, but nodes generated
+    by independent commands are taken from results of the workers, so only
+    commands which depend on the other ones (**REPEAT**, **DEFAULTDELAY**
+    and custom commands) are executed by it. The generated sketch is
+    exactly the same as in the serial parsing
+
+    Rendered text is used only if nodes generated by the command are added
+    to the sketch as is (e.g. they aren't merged by the optimizer). If
+    strings are stored in flash memory or payloads are specialized, nodes
+    are rendered by the stitch pass, because names of constant arrays
+    depend on the previous commands
+
+    Args:
+        chunk_size (int): number of lines in the chunk
+    """
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+
+        # Result of the current line (see `_parse_chunk`)
+        self.result = None
+
+    def attach(self, pparser):
+        """Attaches stitch pass to the instance of the parser, it must be
+        attached before optimizers to get nodes generated by commands as is
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+        """
+        self.pparser = pparser
+
+        self._exec_command = pparser.exec_command
+        self._add = pparser.emitter.add
+
+        pparser.exec_command = self.exec_command
+        pparser.emitter.add = self.add
+
+    def exec_command(self, command):
+        """Returns nodes generated by the worker (or raises its error), or
+        executes the command as usual
+        """
+        if self.result is None:
+            return self._exec_command(command)
+
+        if self.result[1] is not None:
+            raise self.result[1]
+
+        return self.result[0]
+
+    def add(self, nodes):
+        """Adds the text rendered by the worker, or renders nodes as usual
+        """
+        if self.result is None or nodes is not self.result[0] or self.result[2] is None:
+            return self._add(nodes)
+
+        self.pparser.sketch.add_rendered(self.result[2])
+        self.pparser.sketch.payloads.update(self.result[3])
+
+    def chunks(self, source):
+        """Splits the source to chunks
+
+        Args:
+            source (Iterable[str]): lines of the script
+
+        Yields:
+            List[str]: lines of the chunk
+        """
+        source = iter(source)
+
+        while True:
+            lines = list(islice(source, self.chunk_size))
+
+            if not lines:
+                return
+
+            yield lines
+
+    def compile(self, source, jobs):
+        """Parses the script
+
+        Args:
+            source (Iterable[str]): lines of the script
+            jobs (int): number of worker processes, chunks are parsed in the
+                current process if it's 1
+        """
+        pparser = self.pparser
+        args = pparser.args
+
+        options = (
+            not args.disable_alt and pparser.translator.stats is not None,
+            not args.progmem and pparser.sketch.specializer is None,
+            any(item is not None for item in (pparser.optimizer, pparser.compressor, pparser.estimator))
+        )
+
+        if jobs > 1:
+            # Pool of processes is imported only when it's really needed
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(args, getattr(pparser, 'alphabet', None)))
+            pending = deque()
+            chunks = self.chunks(source)
+
+            try:
+                # A few chunks are parsed in advance, so memory usage doesn't
+                # depend on the size of the script
+                for lines in islice(chunks, 2 * jobs):
+                    pending.append((lines, executor.submit(_parse_chunk, lines, *options)))
+
+                while pending:
+                    lines, future = pending.popleft()
+
+                    for lines_next in islice(chunks, 1):
+                        pending.append((lines_next, executor.submit(_parse_chunk, lines_next, *options)))
+
+                    self.stitch(lines, *future.result())
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+                executor.shutdown()
+        else:
+            _init_worker(args, getattr(pparser, 'alphabet', None))
+
+            for lines in self.chunks(source):
+                self.stitch(lines, *_parse_chunk(lines, *options))
+
+    def stitch(self, lines, results, stats):
+        """Feeds lines of the chunk to the parser
+
+        Args:
+            lines (List[str]): lines of the chunk
+            results (list): results of lines (see `_parse_chunk`)
+            stats (Union[List[int], None]): statistics of Alt codes of the chunk
+        """
+        pparser = self.pparser
+
+        if stats is not None:
+            pparser.translator.stats = [a + b for a, b in zip(pparser.translator.stats, stats)]
+
+        try:
+            for line, self.result in zip(lines, results):
+                pparser.exec_line(line)
+        finally:
+            self.result = None
@@ -2,7 +2,8 @@
 """
 
 from .exceptions import *
-from .payloads import *
+from .ir import *
+from .utils import log_info
 
 
 class DuckyCommand:
@@ -18,16 +19,38 @@ class DuckyCommand:
 
     payloads = []
 
+    # IR nodes generated by the last execution of the command, ``None``
+    # if it has failed (see `REPEAT`)
+    ir = None
+
+    # Whether :meth:`repeat_exec` must be called after each subsequent
+    # command of the script
+    repeated = False
+
+    # Whether the command doesn't depend on the other commands of the script
+    # and the state of the parser (except options), so it can be executed
+    # apart from them (see `pparser.chunked`)
+    independent = False
+
     def __init__(self, arg, pparser):
         self.arg = arg
         self._pparser = pparser
 
+    def __getstate__(self):
+        """Instance of PotatoParser isn't pickled with the command, it must
+        be restored by the parser (see :meth:`pparser.parser.PotatoParser.set_state`)
+        """
+        state = self.__dict__.copy()
+        del state['_pparser']
+        return state
+
     def exec(self):
         """This method is called when executing the command, doesn't
         change it during inheritance
 
         Returns:
-            list: Generated Arduino code
+            list: Generated IR nodes (see :mod:`pparser.ir`). Commands can
+            also generate Arduino code in the format of :class:`pparser.payloads.Payload`
 
         Raises:
             CommandArgumentError: Invalid command argument, see argument type
@@ -39,11 +62,12 @@ class DuckyCommand:
         return self._exec(self._parse_arg())
 
     def repeat_exec(self):
-        """This method is called when the command is executed again, doesn't
-        change it during inheritance
+        """This method is called after each subsequent command if
+        :attr:`repeated` is set, doesn't change it during inheritance
 
         Returns:
-            list: Generated Arduino code
+            list: Generated IR nodes (see :mod:`pparser.ir`). Commands can
+            also generate Arduino code in the format of :class:`pparser.payloads.Payload`
 
         Raises:
             CommandArgumentError: Invalid command argument, see argument type
@@ -75,7 +99,8 @@ class DuckyCommand:
             arg (any): Already parsed argument (via :meth:`_parse_arg`)
 
         Returns:
-            list: Generated Arduino code
+            list: Generated IR nodes (see :mod:`pparser.ir`). Commands can
+            also generate Arduino code in the format of :class:`pparser.payloads.Payload`
 
         Raises:
             CommandUsageError: Invalid command usage, see usage examples in
@@ -92,7 +117,8 @@ class DuckyCommand:
             arg (any): Already parsed argument (via :meth:`_parse_arg`)
 
         Returns:
-            list: Generated Arduino code
+            list: Generated IR nodes (see :mod:`pparser.ir`). Commands can
+            also generate Arduino code in the format of :class:`pparser.payloads.Payload`
 
         Raises:
             CommandUsageError: Invalid command usage, see usage examples in
@@ -125,7 +151,8 @@ class REM(DuckyCommand):
 
         REM This is a comment!
     """
-    pass
+
+    independent = True
 
 
 class DELAY(DuckyCommand):
@@ -144,6 +171,8 @@ class DELAY(DuckyCommand):
         REM I just waited 5 seconds!
     """
 
+    independent = True
+
     def _parse_arg(self):
         try:
             arg = int(self.arg)
@@ -154,7 +183,7 @@ class DELAY(DuckyCommand):
         return arg
 
     def _exec(self, arg):
-        return [f'delay({arg});']
+        return [Delay(arg)]
 
 
 class DEFAULTDELAY(DELAY, DuckyCommand):
@@ -179,6 +208,9 @@ class DEFAULTDELAY(DELAY, DuckyCommand):
         REM The total pause is 1.8 seconds
     """
 
+    repeated = True
+    independent = False
+
     def _exec(self, arg):
         if self._pparser.processed_commands:
             raise CommandUsageError('command can be used once at the top of script')
@@ -249,7 +281,7 @@ class REPEAT(DuckyCommand):
         return args
 
     def _exec(self, arg):
-        prev_commands = self._pparser.processed_commands[-arg[1]:]
+        prev_commands = list(self._pparser.processed_commands)[-arg[1]:]
 
         if len(prev_commands) < arg[1]:
             raise CommandArgumentError(f'there are not enough commands to repeat {len(prev_commands)} < {arg[1]}')
@@ -261,15 +293,86 @@ class REPEAT(DuckyCommand):
                 if isinstance(prev_command, invalid_command):
                     raise CommandArgumentError(f'cannot repeat the `{invalid_command.__name__}` command')
 
-        try:
-            return [
-                f'for (short i = 0; i < {arg[0]}; ++i) {{',
-                *[prev_command.exec() for prev_command in prev_commands],
-                '}'
-            ]
-        except Exception:
+        # Nodes generated by the previous commands are reused
+        if any(prev_command.ir is None for prev_command in prev_commands):
             raise CommandInfoWarning('Command skipped due to inoperability of previous ones')
 
+        return [Loop(arg[0], tuple(node for prev_command in prev_commands for node in prev_command.ir))]
+
+
+def _undefined_characters(missing):
+    """Generates description of all undefined characters of the string
+
+    Args:
+        missing (List[Tuple[int, str]]): positions and undefined characters
+            (see :meth:`pparser.alphabet.AltTranslator.missing`)
+
+    Returns:
+        str: error message
+    """
+    positions = {}
+    for i, c in missing:
+        positions.setdefault(c, []).append(str(i))
+
+    return f'undefined character{"s" * (len(missing) > 1)} of string ' + ', '.join(
+        f'`{c}` in {", ".join(i)} position{"s" * (len(i) > 1)}' for c, i in positions.items()
+    )
+
+
+def _missing(command, text):
+    """Finds characters of the text which can't be typed
+
+    Returns:
+        List[Tuple[int, str]]: positions and characters (see
+            :meth:`pparser.alphabet.AltTranslator.missing`)
+    """
+    missing = command._pparser.translator.missing(text)
+    layout = command._pparser.layout
+
+    # Characters of the keyboard layout are typed directly
+    if missing and layout is not None:
+        missing = [(i, c) for i, c in missing if c not in layout.charset]
+
+    return missing
+
+
+def _print_string(command, text, delay=None):
+    """Generates nodes which print the text. If the keyboard layout is
+    specified, characters available on it are typed directly and the rest
+    by Alt codes
+
+    Args:
+        command (DuckyCommand): command which prints the text
+        text (str): text to print
+        delay (Optional[int]): time to pause per character
+
+    Returns:
+        List[Union[pparser.ir.TypeAlt, pparser.ir.TypeText]]: generated nodes
+    """
+    pparser = command._pparser
+
+    if pparser.args.disable_alt:
+        return [TypeText(text, delay)]
+
+    if pparser.layout is None:
+        return [TypeAlt(pparser.translator.translate(text), delay)]
+
+    translator = pparser.translator
+
+    def alt_cost(segment):
+        # Alt key and digits of each code
+        if translator.missing(segment):
+            return float('inf')
+
+        return len(segment) + len(translator.translate(segment).translate(translator.digits_table))
+
+    # Characters of the layout are replaced by characters of the same keys
+    # on the US layout, which are sent by the Keyboard library
+    return [
+        TypeText(pparser.layout.translate(segment), delay) if direct else TypeAlt(translator.translate(segment), delay)
+        for direct, segment in pparser.layout.split(text, alt_cost)
+    ]
+
 
 class STRING(DuckyCommand):
     """Processes the text in two modes (you can choose one)
@@ -288,9 +391,9 @@ class STRING(DuckyCommand):
         STRING Another text :)
     """
 
-    def _parse_arg(self):
-        self.payloads = [printDefaultString]
+    independent = True
 
+    def _parse_arg(self):
         if self.arg is None:
             raise CommandArgumentError('expected string, but got nothing')
 
@@ -299,18 +402,14 @@ class STRING(DuckyCommand):
         if self._pparser.args.disable_alt:
             return arg
 
-        for i, c in enumerate(arg):
-            if c not in self._pparser.alphabet:
-                raise CommandArgumentError(f'undefined character of string `{c}` in {i + 1} position')
-
-        self.payloads = [printAltString]
+        missing = _missing(self, arg)
+        if missing:
+            raise CommandArgumentError(_undefined_characters(missing))
 
         return arg
 
     def _exec(self, arg):
-        if self._pparser.args.disable_alt:
-            return [f'printDefaultString(F("{arg}"));']
-        return [f"printAltString({{{', '.join(str(self._pparser.alphabet[c]) + '_S' for c in arg)}}});"]
+        return _print_string(self, arg)
 
 
 class STRINGDELAY(DuckyCommand):
@@ -335,9 +434,9 @@ class STRINGDELAY(DuckyCommand):
         REM These commands takes 6 seconds!
     """
 
-    def _parse_arg(self):
-        self.payloads = [printDefaultString]
+    independent = True
 
+    def _parse_arg(self):
         if self.arg is None:
             raise CommandArgumentError('expected 2 arguments, but got nothing')
 
@@ -355,18 +454,14 @@ class STRINGDELAY(DuckyCommand):
         if self._pparser.args.disable_alt:
             return args
 
-        for i, c in enumerate(args[1]):
-            if c not in self._pparser.alphabet:
-                raise CommandArgumentError(f'undefined character of string `{c}` in {i + 1} position')
-
-        self.payloads = [printAltString]
+        missing = _missing(self, args[1])
+        if missing:
+            raise CommandArgumentError(_undefined_characters(missing))
 
         return args
 
     def _exec(self, arg):
-        if self._pparser.args.disable_alt:
-            return [f'printDefaultString(F("{arg[1]}"), {arg[0]});']
-        return [f"printAltString({{{', '.join(str(self._pparser.alphabet[c]) + '_S' for c in arg[1])}}}, {arg[0]});"]
+        return _print_string(self, arg[1], arg[0])
 
 
 class STRING_DELAY(STRINGDELAY, DuckyCommand):
@@ -457,15 +552,15 @@ class SingleKey(DuckyCommand):
     for k, v in single_keys.items():
         __doc__ += ' ' * 8 + f'"{" or ".join(k)}", "{v[1]}"\n'
 
-    payloads = [pressSingleKey]
     _key = ''
+    independent = True
 
     def _parse_arg(self):
         if self.arg is not None:
             raise CommandArgumentError("command doesn't accept any arguments")
 
     def _exec(self, arg):
-        return [f'pressSingleKey({self._key});']
+        return [Press(self._key)]
 
 
 for names, key_and_desc in single_keys.items():
@@ -518,8 +613,8 @@ class ComboKey(DuckyCommand):
     for k, v in combo_keys.items():
         __doc__ += ' ' * 8 + f'"{" or ".join(k)}", "{v[1]}"\n'
 
-    payloads = [pressComboKey]
     _key = ''
+    independent = True
 
     def _parse_arg(self):
         if self.arg is None:
@@ -554,10 +649,106 @@ class ComboKey(DuckyCommand):
         raise CommandArgumentError(f'last argument expected as SingleKey or ASCII lowercase char (a-z), but got `{args[-1]}`')
 
     def _exec(self, arg):
-        return [f"pressComboKey({{{', '.join(['(uint8_t)' + i for i in [self._key] + arg])}}});"]
+        return [Combo((self._key, *arg))]
 
 
 for names, key_and_desc in combo_keys.items():
     key, desc = key_and_desc
     for name in names:
         locals()[name] = type(name, (ComboKey, DuckyCommand), {'_key': key})
+
+
+"""Registry of working commands in the following format
+
+.. code-block:: python
+
+    registry = {
+        'COMMAND_1': CommandClass_1,
+        ...
+        'COMMAND_N': CommandClass_N
+    }
+
+It's filled once at import with the commands defined above (including
+aliases such as **DEFAULT_DELAY** and **STRING_DELAY** and each name of
+:class:`SingleKey` and :class:`ComboKey`). Third-party commands are
+registered through the ``pparser.commands`` entry point group and are
+loaded lazily, on the first lookup of an unknown name
+"""
+registry = {}
+
+_plugins_loaded = False
+
+
+def register_command(command, name=None):
+    """Adds command to the registry, after that it can be called from
+    a script. Can be used as a decorator
+
+    Args:
+        command (Type[DuckyCommand]): class of the command
+        name (Optional[str]): name of the command in a script, defaults
+            to the name of the class
+
+    Returns:
+        Type[DuckyCommand]: the same command
+    """
+    name = name or command.__name__
+
+    if not name.isupper():
+        raise ValueError(f'name of the working command must be in the CAPSLOCK style, but got `{name}`')
+
+    registry[name] = command
+    return command
+
+
+def _load_plugins():
+    """Registers commands declared by installed packages in the
+    ``pparser.commands`` entry point group. Entry point name is used
+    as a name of the command
+    """
+    global _plugins_loaded
+    _plugins_loaded = True
+
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group='pparser.commands')
+    else:
+        eps = eps.get('pparser.commands', [])
+
+    for ep in eps:
+        # Built-in commands can't be overridden
+        if ep.name in registry:
+            continue
+
+        try:
+            register_command(ep.load(), ep.name)
+        except Exception as e:
+            log_info(f'Failed to load command `{ep.name}` from `{ep.value}`: {e}')
+
+
+def get_command(name):
+    """Finds command by its name
+
+    Args:
+        name (str): name of the command in a script
+
+    Returns:
+        Union[Type[DuckyCommand], None]: class of the command or ``None``
+            if command with such name doesn't exist
+    """
+    command = registry.get(name)
+
+    if command is None and not _plugins_loaded:
+        _load_plugins()
+        command = registry.get(name)
+
+    return command
+
+
+for name, command in list(locals().items()):
+    if isinstance(command, type) and issubclass(command, DuckyCommand) and name.isupper():
+        register_command(command, name)
@@ -0,0 +1,125 @@
+"""File containing the collector of errors and warnings of the parser
+"""
+
+from json import dumps
+
+from .exceptions import ParsingAborted
+from .utils import format_error, format_info
+
+
+class Diagnostic:
+    """Error or warning of the script
+
+    Args:
+        level (str): ``'error'`` or ``'info'`` (warning)
+        code (str): code of the error (``E...``) or warning (``W...``), see
+            :attr:`pparser.exceptions.PotatoParserError.code`
+        line (Optional[int]): number of the line, starting from 1, ``None``
+            if it's related to the whole script (e.g. missing alphabet)
+        column (Optional[int]): number of the column, starting from 1
+        message (str): message
+    """
+
+    __slots__ = ('level', 'code', 'line', 'column', 'message')
+
+    def __init__(self, level, code, line, column, message):
+        self.level = level
+        self.code = code
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        if self.line is None:
+            return self.message
+
+        return f'{self.message} (line {self.line})'
+
+    def __getstate__(self):
+        return self.level, self.code, self.line, self.column, self.message
+
+    def __setstate__(self, state):
+        self.level, self.code, self.line, self.column, self.message = state
+
+    def to_dict(self):
+        """Returns the diagnostic in JSON-compatible format
+        """
+        return {
+            'level': self.level,
+            'code': self.code,
+            'line': self.line,
+            'column': self.column,
+            'message': self.message
+        }
+
+
+class Diagnostics:
+    """Collects errors and warnings of the script, so they are printed at once
+    after parsing instead of printing of each of them (console output is
+    much slower than parsing of the line)
+
+    Args:
+        max_errors (Optional[int]): number of errors after which parsing is
+            aborted, it's never aborted if not specified
+    """
+
+    def __init__(self, max_errors=None):
+        self.max_errors = max_errors
+        self.items = []
+        self.errors = 0
+
+        # Whether parsing was aborted by the limit of errors
+        self.aborted = False
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, diagnostic):
+        """Adds the diagnostic
+
+        Args:
+            diagnostic (Diagnostic): error or warning
+
+        Raises:
+            ParsingAborted: the limit of errors is reached
+        """
+        self.items.append(diagnostic)
+
+        if diagnostic.level == 'error':
+            self.errors += 1
+
+            if self.max_errors is not None and self.errors >= self.max_errors:
+                self.aborted = True
+                raise ParsingAborted(str(diagnostic))
+
+    def extend(self, diagnostics):
+        """Adds several diagnostics (e.g. restored from the cache), see :meth:`add`
+        """
+        for diagnostic in diagnostics:
+            self.add(diagnostic)
+
+    def print(self):
+        """Prints all diagnostics to the console by a single call
+        """
+        if self.items:
+            print('\n'.join(
+                (format_error if item.level == 'error' else format_info)(str(item)) for item in self.items
+            ))
+
+    def dump(self, source=None, file=None):
+        """Prints all diagnostics to the console in JSON format, as one line
+
+        Args:
+            source (Optional[pathlib.Path]): path to the script
+            file (Optional[TextIO]): stream to print to, defaults to stdout
+        """
+        print(dumps({
+            'source': None if source is None else str(source),
+            'errors': self.errors,
+            'warnings': len(self.items) - self.errors,
+            'aborted': self.aborted,
+            'diagnostics': [item.to_dict() for item in self.items]
+        }, ensure_ascii=False), file=file)
@@ -0,0 +1,93 @@
+"""File containing the cost model of encodings of Alt codes sequences
+(see :class:`pparser.alphabet.AltTranslator`)
+"""
+
+
+# Encodings which can be chosen by the user
+encodings = ('u16', 'u8', 'keys')
+
+# Approximate size in bytes of each payload compiled by avr-gcc for
+# ATmega32u4: (payload, PROGMEM payload)
+_payload_size = {
+    'u16': (120, 130),
+    'u8': (116, 124),
+    'keys': (70, 78)
+}
+
+# Approximate number of CPU cycles which the device spends on preparing of
+# one Alt code (except typing itself, i.e. USB reports and delays). Codes
+# are split to digits by 16-bit division, which takes about 220 cycles on
+# AVR, and each digit takes about 4 divisions. Precomputed keys are just read
+_cycles_per_code = 50
+_cycles_per_digit = {
+    'u16': 4 * 220,
+    'u8': 4 * 220,
+    'keys': 20
+}
+
+# Clock frequency of Arduino Leonardo and Micro
+_frequency = 16000000
+
+
+def report(stats, progmem=False, u8=True):
+    """Estimates flash size and CPU time on the device for each encoding
+
+    Args:
+        stats (List[int]): number of strings, characters and digits of their
+            Alt codes (see :attr:`pparser.alphabet.AltTranslator.stats`)
+        progmem (bool): whether codes are stored in flash memory
+        u8 (bool): whether all codes of the alphabet fit in 8 bits
+
+    Returns:
+        Dict[str, Union[dict, None]]: estimations for each encoding, sizes
+            are in bytes and CPU time is in milliseconds. Encodings which
+            can't be used have no estimation
+    """
+    strings, chars, digits = stats
+
+    data = {
+        'u16': 2 * chars,
+        'u8': chars,
+        'keys': digits + chars
+    }
+
+    estimations = {}
+
+    for encoding in encodings:
+        if encoding == 'u8' and not u8:
+            estimations[encoding] = None
+            continue
+
+        payload = _payload_size[encoding][progmem]
+        cycles = chars * _cycles_per_code + digits * _cycles_per_digit[encoding]
+
+        estimations[encoding] = {
+            'data': data[encoding],
+            'payload': payload,
+            'flash': data[encoding] + payload,
+            'cpu_ms': round(cycles / _frequency * 1000, 2)
+        }
+
+    return estimations
+
+
+def print_report(pparser):
+    """Prints estimations of flash size and CPU time on the device for each
+    encoding of the parsed script
+
+    Args:
+        pparser (pparser.parser.PotatoParser): parser which has processed the script
+    """
+    translator = pparser.translator
+    estimations = report(translator.stats, pparser.args.progmem, translator.u8)
+
+    print(f'Alt codes: {translator.stats[1]} characters in {translator.stats[0]} strings')
+    print(f'{"Encoding":<12}{"Data, B":>12}{"Payload, B":>12}{"Flash, B":>12}{"CPU, ms":>12}')
+
+    for encoding, estimation in estimations.items():
+        if estimation is None:
+            print(f'{encoding:<12}  unavailable, Alt codes don\'t fit in 8 bits')
+            continue
+
+        mark = ' *' if encoding == translator.encoding else ''
+        print(f'{encoding:<12}{estimation["data"]:>12}{estimation["payload"]:>12}{estimation["flash"]:>12}{estimation["cpu_ms"]:>12}{mark}')
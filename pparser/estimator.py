@@ -0,0 +1,178 @@
+"""File containing the estimator of execution time of the sketch on the
+device
+"""
+
+from argparse import ArgumentTypeError
+from heapq import heappush, heappushpop
+
+from .ir import Combo, Delay, Loop, Press, TypeAlt, TypeText
+
+
+class TimingModel:
+    """Time of actions on the device in milliseconds
+
+    Args:
+        key (float): delay after pressing of the key in ``pressSingleKey``
+            and ``pressComboKey`` payloads
+        report (float): time of sending one HID report, each pressing or
+            releasing of the key sends a report
+        startup (float): delay before the payload starts
+    """
+
+    def __init__(self, key=20, report=1, startup=2500):
+        self.key = key
+        self.report = report
+        self.startup = startup
+
+    @classmethod
+    def parse(cls, value):
+        """Parses the timing model from the option in format ``name=MS,...``,
+        e.g. ``key=20,report=1``. Missing values have their defaults
+
+        Args:
+            value (str): value of the option
+
+        Returns:
+            TimingModel: the timing model
+        """
+        model = cls()
+
+        for item in filter(None, value.split(',')):
+            name, _, ms = item.partition('=')
+
+            if name not in ('key', 'report', 'startup'):
+                raise ArgumentTypeError(f'unknown timing `{name}`, expected key, report or startup')
+
+            try:
+                setattr(model, name, float(ms))
+            except ValueError:
+                raise ArgumentTypeError(f'time of `{name}` expected as number, but got `{ms}`')
+
+        return model
+
+
+class Estimator:
+    """Estimates wall-clock time of the payload on the device by IR nodes
+    generated for each line of the script. It's attached to the parser by
+    wrapping methods of its instances, like :class:`pparser.profiler.Profiler`
+
+    Only :attr:`top` slowest lines are kept, so memory usage doesn't depend
+    on the size of the script. Code generated by custom commands directly
+    (not by IR nodes) isn't taken into account
+
+    Args:
+        model (TimingModel): time of actions on the device
+        top (int): number of the slowest lines to keep
+    """
+
+    def __init__(self, model, top):
+        self.model = model
+        self.top = top
+
+        # Total time and heap of the slowest lines in format `(ms, line, text)`
+        self.total = 0
+        self.lines = []
+
+        # Time of the current line
+        self.current = 0
+
+    def attach(self, pparser):
+        """Attaches estimator to the instance of the parser, it must be
+        attached after all optimizers to see nodes generated by commands
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+        """
+        self.pparser = pparser
+
+        translator = getattr(pparser, 'translator', None)
+        self.digits_table = translator.digits_table if translator else None
+
+        self._add = pparser.emitter.add
+        self._exec_line = pparser.exec_line
+
+        pparser.emitter.add = self.add
+        pparser.exec_line = self.exec_line
+
+    def cost(self, nodes):
+        """Estimates time of the nodes
+
+        Args:
+            nodes (Iterable): IR nodes
+
+        Returns:
+            float: time in milliseconds
+        """
+        model = self.model
+        press = model.key + 2 * model.report
+        ms = 0
+
+        for node in nodes:
+            if isinstance(node, Delay):
+                ms += node.ms
+            elif isinstance(node, Press):
+                ms += press
+            elif isinstance(node, Combo):
+                # Each key is pressed separately, but released at once
+                ms += model.key + (len(node.keys) + 1) * model.report
+            elif isinstance(node, TypeText):
+                ms += len(node.text) * (press + (node.delay or 0))
+            elif isinstance(node, TypeAlt):
+                # Alt is held while digits are pressed
+                digits = len(node.codes.translate(self.digits_table))
+                ms += len(node.codes) * 2 * model.report + digits * (press + (node.delay or 0))
+            elif isinstance(node, Loop):
+                ms += node.n * self.cost(node.body)
+
+        return ms
+
+    def add(self, nodes):
+        """Adds time of nodes to the current line
+        """
+        if nodes:
+            self.current += self.cost(nodes)
+
+        self._add(nodes)
+
+    def exec_line(self, line):
+        """Executes the line and records its time
+        """
+        self.current = 0
+        self._exec_line(line)
+
+        if self.current:
+            self.total += self.current
+            item = (self.current, self.pparser.i, line.strip()[:60])
+
+            if len(self.lines) < self.top:
+                heappush(self.lines, item)
+            else:
+                heappushpop(self.lines, item)
+
+    def runtime(self):
+        """Returns estimated time of the whole payload (including delay
+        before it's started) in seconds
+        """
+        return (self.model.startup + self.total) / 1000
+
+    def print(self):
+        """Prints estimated time and the slowest lines
+        """
+        print(f'Estimated runtime: {self.runtime():.2f}s (including startup delay of {self.model.startup / 1000:.2f}s)')
+
+        if self.lines:
+            print(f'{"Line":>8}  {"Time, ms":>12}  Command')
+
+        for ms, line, text in sorted(self.lines, reverse=True):
+            print(f'{line:>8}  {ms:>12.1f}  {text}')
+
+    def get_state(self):
+        """Returns the state of the estimator (see :meth:`pparser.parser.PotatoParser.get_state`)
+        """
+        return self.total, list(self.lines)
+
+    def set_state(self, state):
+        """Restores the state of the estimator returned by :meth:`get_state`
+        """
+        self.total, lines = state
+        self.lines = list(lines)
@@ -8,9 +8,12 @@ class PotatoParserError(Exception):
     console
     """
 
+    # Code of the error in diagnostics (see :class:`pparser.diagnostics.Diagnostic`)
+    code = 'E100'
+
     def _log_func(self, msg):
         """Local function which used only to print log message to console.
-        Used by :meth:`log` and must be redefined
+        Used by :meth:`log` and must be redefined for the instance
 
         Args:
             msg (str): a message to print in the console
@@ -25,24 +28,43 @@ class PotatoParserError(Exception):
 
 
 class CommandArgumentError(PotatoParserError):
+    code = 'E102'
+
     def log(self):
         self._log_func('Invalid command argument(s): ' + str(self))
 
 
 class CommandUsageError(PotatoParserError):
+    code = 'E103'
+
     def log(self):
         self._log_func('Invalid command usage: ' + str(self))
 
 
+class AlphabetError(PotatoParserError):
+    """Raised when the alphabet of Alt codes is malformed (see ``-a`` option)
+    """
+    pass
+
+
+class LayoutError(PotatoParserError):
+    """Raised when the keyboard layout is malformed (see ``--layout`` option)
+    """
+    pass
+
+
 class PotatoParserWarning(Exception):
     """Common base class for all warnings of PotatoParser. Has
     additional :meth:`log` function to log current warning to
     console
     """
 
+    # Code of the warning in diagnostics
+    code = 'W100'
+
     def _log_func(self, msg):
         """Local function which used only to print log message to console.
-        Used by :meth:`log` and must be redefined
+        Used by :meth:`log` and must be redefined for the instance
 
         Args:
             msg (str): a message to print in the console
@@ -57,4 +79,12 @@ class PotatoParserWarning(Exception):
 
 
 class CommandInfoWarning(PotatoParserWarning):
+    code = 'W101'
+
+
+class ParsingAborted(Exception):
+    """Raised by the parser to stop parsing at the first error, if errors
+    aren't allowed (see ``--error-ok`` option), or when the limit of errors
+    is reached (see ``--max-errors`` option)
+    """
     pass
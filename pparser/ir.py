@@ -0,0 +1,118 @@
+"""File containing the intermediate representation (IR) of the parsed
+script. Commands generate IR nodes, which are optimized (see
+:mod:`pparser.optimizer`) and rendered to C++ by :class:`pparser.sketch.CppEmitter`
+
+Nodes are immutable and compact (they have ``__slots__``), so many of them
+can be kept in memory. Nodes are compared by value, which allows to find
+repeated sequences of nodes
+"""
+
+
+class Node:
+    """Abstract class of IR nodes. Fields of the node are listed in
+    ``__slots__``, they must not be changed after creation
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __setstate__(self, state):
+        for field, value in zip(self.__slots__, state):
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.__getstate__() == other.__getstate__()
+
+    def __hash__(self):
+        return hash((type(self), self.__getstate__()))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(map(repr, self.__getstate__()))})'
+
+
+class Delay(Node):
+    """Pause
+
+    Args:
+        ms (int): time to pause in milliseconds
+    """
+
+    __slots__ = ('ms',)
+
+    def __init__(self, ms):
+        self.ms = ms
+
+
+class TypeAlt(Node):
+    """Typing of the string by Alt codes
+
+    Args:
+        codes (str): Alt codes of the characters, each code is stored as
+            a character with such code point (e.g. ``'\\x48\\x69'`` for ``Hi``),
+            that's much more compact than a list of numbers
+        delay (Union[int, None]): time to pause per character
+    """
+
+    __slots__ = ('codes', 'delay')
+
+    def __init__(self, codes, delay=None):
+        self.codes = codes
+        self.delay = delay
+
+
+class TypeText(Node):
+    """Typing of the string by normal keystrokes
+
+    Args:
+        text (str): text to type
+        delay (Union[int, None]): time to pause per character
+    """
+
+    __slots__ = ('text', 'delay')
+
+    def __init__(self, text, delay=None):
+        self.text = text
+        self.delay = delay
+
+
+class Press(Node):
+    """Pressing of one key
+
+    Args:
+        key (str): C++ constant of the key, e.g. ``KEY_RETURN``
+    """
+
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+
+class Combo(Node):
+    """Pressing of several keys at the same time
+
+    Args:
+        keys (Tuple[str]): C++ constants of the keys
+    """
+
+    __slots__ = ('keys',)
+
+    def __init__(self, keys):
+        self.keys = keys
+
+
+class Loop(Node):
+    """Repetition of nodes
+
+    Args:
+        n (int): number of repetitions
+        body (Tuple[Node]): nodes to repeat
+    """
+
+    __slots__ = ('n', 'body')
+
+    def __init__(self, n, body):
+        self.n = n
+        self.body = body
@@ -0,0 +1,155 @@
+"""File containing the loader of keyboard layouts, they define characters
+which can be typed directly by keystrokes instead of Alt codes
+"""
+
+from json import JSONDecodeError, load
+from pathlib import Path
+import re
+
+from .exceptions import LayoutError
+from .utils import check_file
+
+
+# Directory with layouts supplied by default
+layouts_dir = Path(__file__).parent / 'layouts'
+
+# Keys of the keyboard in the order of layouts, they're named by characters
+# of the US layout, because Arduino Keyboard library sends keys by them
+keys = '`1234567890-=qwertyuiop[]\\asdfghjkl;\'zxcvbnm,./'
+shifted_keys = '~!@#$%^&*()_+QWERTYUIOP{}|ASDFGHJKL:"ZXCVBNM<>?'
+
+
+class Layout:
+    """Keyboard layout of the target computer. Each character of the layout
+    is typed by the key in the same position of :data:`keys`, so it's
+    replaced by the US character of this key, and the Keyboard library
+    presses the right key (with Shift, if it's needed)
+
+    Args:
+        direct (str): characters of keys without Shift in the order of
+            :data:`keys`, space means that the key has no character
+        shift (str): characters of keys with Shift in the same order
+
+    Raises:
+        LayoutError: number of characters doesn't match the number of keys
+    """
+
+    # Cost of switching between keystrokes and Alt codes in keystrokes, each
+    # segment is a separate call of the payload, which releases all keys
+    switch_cost = 4
+
+    def __init__(self, direct, shift):
+        for name, chars in (('direct', direct), ('shift', shift)):
+            if not isinstance(chars, str) or len(chars) != len(keys):
+                raise LayoutError(f'`{name}` must be a string of {len(keys)} characters (one per key), but got {chars!r}')
+
+        self.direct = direct
+        self.shift = shift
+
+        # Space bar types space in any layout. If the character is typed by
+        # several keys, the first one is used
+        self.table = {ord(' '): ' '}
+
+        for chars, us_chars in ((direct, keys), (shift, shifted_keys)):
+            for c, us_c in zip(chars, us_chars):
+                if c != ' ':
+                    self.table.setdefault(ord(c), us_c)
+
+        self.charset = frozenset(map(chr, self.table))
+        self.pattern = re.compile(f'([{re.escape("".join(sorted(self.charset)))}]+)')
+
+    def translate(self, text):
+        """Replaces characters of the layout by US characters of the same keys
+
+        Args:
+            text (str): text which consists of characters of the layout
+
+        Returns:
+            str: text typed by the Keyboard library
+        """
+        return text.translate(self.table)
+
+    def split(self, text, alt_cost):
+        """Splits the text to segments typed by keystrokes and by Alt codes.
+        Keystroke is cheaper than Alt code, but each switch between them
+        costs :attr:`switch_cost` keystrokes, so short runs of characters of
+        the layout between Alt codes (e.g. spaces) are typed by Alt codes too
+
+        Args:
+            text (str): text to split
+            alt_cost (Callable[[str], float]): number of keystrokes needed to
+                type the text by Alt codes (infinity if it can't be typed)
+
+        Yields:
+            Tuple[bool, str]: whether the segment is typed by keystrokes and
+                the segment itself
+        """
+        # Odd parts are matched by the pattern
+        parts = [[i % 2 == 1, part] for i, part in enumerate(self.pattern.split(text)) if part]
+
+        for i, part in enumerate(parts):
+            if not part[0]:
+                continue
+
+            # Number of switches saved, if the run is typed by Alt codes
+            switches = (i > 0) + (i < len(parts) - 1)
+
+            if switches and alt_cost(part[1]) <= len(part[1]) + self.switch_cost * switches:
+                part[0] = False
+
+        direct, segment = parts[0] if parts else (True, '')
+
+        for next_direct, part in parts[1:]:
+            if next_direct == direct:
+                segment += part
+            else:
+                yield direct, segment
+                direct, segment = next_direct, part
+
+        if segment:
+            yield direct, segment
+
+
+def layout_path(name):
+    """Finds the layout by its name
+
+    Args:
+        name (str): name of the layout supplied by default (e.g. ``us``) or
+            path to the layout
+
+    Returns:
+        pathlib.Path: path to the layout
+    """
+    path = layouts_dir / f'{name}.json'
+    return path if path.is_file() else Path(name)
+
+
+def load_layout(name):
+    """Loads the keyboard layout
+
+    Args:
+        name (str): name of the layout supplied by default (e.g. ``us``) or
+            path to the layout
+
+    Returns:
+        Layout: the layout
+
+    Raises:
+        LayoutError: the layout is malformed
+    """
+    path = layout_path(name)
+    check_file(path)
+
+    try:
+        with open(path, encoding='utf-8') as file:
+            layout = load(file)
+    except (JSONDecodeError, UnicodeDecodeError) as e:
+        raise LayoutError(f'Layout `{path}` is malformed: {e}')
+
+    if not isinstance(layout, dict):
+        raise LayoutError(f'Layout `{path}` is malformed: expected JSON object')
+
+    try:
+        return Layout(layout.get('direct', ''), layout.get('shift', ''))
+    except LayoutError as e:
+        raise LayoutError(f'Layout `{path}` is malformed: {e}')
@@ -1,49 +1,417 @@
 """File containing the main parser entrypoint
 """
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
+from contextlib import nullcontext, redirect_stdout
+from glob import glob
+from io import StringIO
 from pathlib import Path
 from time import time
-from sys import argv
+from sys import argv, exit
+import sys
 
-from .art import gen_art
+from colorama import init
+
+from .alphabet import load_alphabet
+from .art import gen_art, wait_remote_version
+from .estimator import TimingModel
+from .exceptions import AlphabetError, LayoutError, ParsingAborted
 from .parser import PotatoParser
-from .utils import check_file, log_success
+from .profiler import Profiler
+from .reader import read_script
+from .utils import check_file, checkpoints_dir, log_error, log_info, log_success
 
 
-def main(argv=argv[1:]):
-    """Main entrypoint of PotatoParser
+# Alphabet of Alt codes shared with the workers of the process pool
+_alphabet = None
+
+# Stream of diagnostics in JSON format. The rest of console output goes to
+# stderr in this mode, so stdout contains only JSON lines
+_diagnostics_file = None
+
+
+def expand_sources(paths):
+    """Expands the specified sources to the list of script files. Directories
+    are replaced by the files they contain (non-recursively, hidden files are
+    skipped), paths which don't exist are treated as glob patterns
 
     Args:
-        argv (Optional[list]): Parser options, defaults to `sys.argv`
+        paths (List[pathlib.Path]): sources specified by the user
+
+    Returns:
+        List[pathlib.Path]: paths to scripts
+    """
+    sources = []
+
+    for path in paths:
+        if path.is_dir():
+            sources.extend(sorted(p for p in path.iterdir() if p.is_file() and not p.name.startswith('.')))
+        elif path.exists():
+            sources.append(path)
+        else:
+            matches = sorted(Path(p) for p in glob(str(path)) if Path(p).is_file())
+
+            # Nothing matched, so it's just a missing file
+            if not matches:
+                check_file(path)
+
+            sources.extend(matches)
+
+    return sources
+
+
+def compile_script(args, alphabet=None, profiler=None, cache=None):
+    """Parses the script **args.source** to the sketch **args.output**
+
+    Args:
+        args (argparse.Namespace): parser options
+        alphabet (Optional[dict]): already loaded alphabet of Alt codes
+        profiler (Optional[pparser.profiler.Profiler]): profiler of parsing,
+            created if **args.profile** is specified
+        cache (Optional[pparser.cache.CompilationCache]): cache of checkpoints,
+            created if **args.cache** is specified
+
+    Returns:
+        pparser.parser.PotatoParser: parser which has processed the script
+    """
+    if args.profile and profiler is None:
+        profiler = Profiler()
+
+    try:
+        pparser = PotatoParser(args, alphabet)
+    except (AlphabetError, LayoutError) as e:
+        log_error(str(e))
+        exit(1)
+
+    if args.encoding_report and not args.disable_alt:
+        pparser.translator.stats = [0, 0, 0]
+
+    if profiler is not None:
+        profiler.attach(pparser)
+
+    check_file(args.source)
+
+    try:
+        if cache is None and args.cache:
+            # Cache is imported only when it's really needed
+            from .cache import CompilationCache
+            cache = CompilationCache(args.cache, args.cache_size << 20)
+
+        if cache is not None or pparser.chunked is not None:
+            with open(args.source, encoding='utf-8') as source:
+                if profiler is not None:
+                    source = profiler.timed_iter('read', source)
+
+                if cache is not None:
+                    cache.compile(pparser, source)
+                    cache.trim()
+                else:
+                    pparser.chunked.compile(source, args.jobs)
+        else:
+            tokens = read_script(args.source)
+
+            if profiler is not None:
+                tokens = profiler.timed_iter('read', tokens)
+
+            # Blank lines and comments are skipped without tokenization
+            for token in tokens:
+                if token.__class__ is list:
+                    for line in token:
+                        pparser.exec_line(line)
+                else:
+                    pparser.skip_lines(token)
+    except ParsingAborted:
+        print_diagnostics(args, pparser)
+
+        if args.max_errors is not None and args.diagnostics == 'text':
+            log_error(f'Parsing aborted after {pparser.diagnostics.errors} error{"s" * (pparser.diagnostics.errors != 1)} (see --max-errors)')
+
+        # The sketch file remains empty
+        exit(1)
+
+    print_diagnostics(args, pparser)
+    pparser.sketch.flush()
+
+    if pparser.optimizer is not None:
+        log_info(f'Optimizer saved {pparser.optimizer.statements} statements ({pparser.optimizer.bytes} bytes)')
+
+    if pparser.compressor is not None:
+        log_info(f'Loop compression replaced {pparser.compressor.statements} statements with {pparser.compressor.loops} loops')
+
+    if pparser.sketch.specializer is not None:
+        for line in pparser.sketch.specializer.summary():
+            log_info(line)
+
+    if args.encoding_report and not args.disable_alt:
+        from .encodings import print_report
+        print_report(pparser)
+
+    if pparser.estimator is not None:
+        if args.estimate:
+            pparser.estimator.print()
+
+        if args.max_runtime is not None and pparser.estimator.runtime() > args.max_runtime:
+            log_error(f'Estimated runtime {pparser.estimator.runtime():.2f}s exceeds the limit of {args.max_runtime}s')
+            exit(1)
+
+    if profiler is not None:
+        if args.profile == '-':
+            profiler.print()
+        else:
+            profiler.dump(args.profile)
+
+    return pparser
+
+
+def print_diagnostics(args, pparser):
+    """Prints errors and warnings collected while parsing of the script
+
+    Args:
+        args (argparse.Namespace): parser options
+        pparser (pparser.parser.PotatoParser): parser which has processed the script
+    """
+    if args.diagnostics == 'json':
+        pparser.diagnostics.dump(args.source, _diagnostics_file)
+    else:
+        pparser.diagnostics.print()
+
+
+def _init_worker(alphabet):
+    """Initializer of the process pool workers
+    """
+    global _alphabet
+    _alphabet = alphabet
+
+
+def _compile_job(args):
+    """Parses one script of the batch. Console output is captured to be
+    printed in the summary, so logs of parallel jobs aren't mixed
+
+    Args:
+        args (argparse.Namespace): parser options of the script
+
+    Returns:
+        Tuple[bool, Union[int, None], float, str, str]: whether the script was
+            parsed (errors are allowed with ``--error-ok``, as for a single
+            script), number of parsed lines, time spent in seconds, console
+            output and diagnostics in JSON format
+    """
+    global _diagnostics_file
+
+    output = StringIO()
+    diagnostics = StringIO()
+    start = time()
+
+    # Diagnostics are captured separately, they are printed to stdout
+    previous, _diagnostics_file = _diagnostics_file, diagnostics
+
+    try:
+        with redirect_stdout(output):
+            pparser = compile_script(args, _alphabet)
+    except SystemExit:
+        return False, None, time() - start, output.getvalue(), diagnostics.getvalue()
+    finally:
+        _diagnostics_file = previous
+
+    return True, pparser.i, time() - start, output.getvalue(), diagnostics.getvalue()
+
+
+def compile_batch(args, sources):
+    """Parses several scripts, possibly in parallel. Each script is written to
+    its own sketch directory inside **args.output** named after the script
+
+    Args:
+        args (argparse.Namespace): parser options
+        sources (List[pathlib.Path]): paths to scripts
+
+    Returns:
+        bool: whether all scripts were parsed
+    """
+    jobs = []
+
+    for source in sources:
+        output = args.output / source.stem
+
+        if any(job.output == output for job in jobs):
+            log_error(f'Scripts `{source}` and `{next(job.source for job in jobs if job.output == output)}` have the same output sketch `{output}`')
+            exit(1)
+
+        # Each script has its own profile next to the specified one, e.g.
+        # `profile.payload.json` for `profile.json`
+        profile = args.profile
+
+        if profile and profile != '-':
+            profile = Path(profile).with_name(f'{Path(profile).stem}.{source.stem}{Path(profile).suffix}')
+
+        # Scripts are parsed in parallel themselves, so they aren't split to chunks
+        jobs.append(Namespace(**{**vars(args), 'source': source, 'output': output, 'chunk_size': None, 'profile': profile}))
+
+    start = time()
+
+    if args.jobs > 1:
+        # Pool of processes is imported only when it's really needed
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(args.jobs, initializer=_init_worker, initargs=(_alphabet,)) as executor:
+            results = list(executor.map(_compile_job, jobs))
+    else:
+        results = [_compile_job(job) for job in jobs]
+
+    failures = 0
+
+    for job, (success, lines, elapsed, output, diagnostics) in zip(jobs, results):
+        if output:
+            print(output, end='')
+
+        if diagnostics:
+            print(diagnostics, end='', file=_diagnostics_file)
+
+        if success:
+            log_info(f'`{job.source}` -> `{job.output}`: {lines} line{"s" * bool(lines - 1)} in {round(elapsed * 1000)}ms')
+        else:
+            failures += 1
+            log_error(f'`{job.source}` failed in {round(elapsed * 1000)}ms')
+
+    summary = f'{len(jobs) - failures} of {len(jobs)} script{"s" * bool(len(jobs) - 1)} in {round((time() - start) * 1000)}ms'
+
+    if failures:
+        log_error(f'Parsed {summary}, {failures} failed')
+    else:
+        log_success(f'Successfully parsed {summary}')
+
+    return not failures
+
+
+def build_arg_parser():
+    """Creates parser of the command-line options
+
+    Returns:
+        argparse.ArgumentParser: parser of the options
     """
     parser = ArgumentParser(description='Potato Parser is converter of Ducky Script to Arduino sketch with some additional funcitons (like Alt codes)')
 
-    parser.add_argument(dest='source', type=Path, metavar='SOURCE', help='path to source of ducky script that needs to be parsed')
+    parser.add_argument(dest='sources', type=Path, metavar='SOURCE', nargs='+', help='path to source of ducky script that needs to be parsed, directory with scripts or glob pattern')
 
     parser.add_argument('-e', '--error-ok', action='store_true', help='do not exit if an error occurred during parsing')
+    parser.add_argument('--max-errors', type=int, metavar='N', help='stop parsing after N errors, even with --error-ok')
+    parser.add_argument('--diagnostics', choices=('text', 'json'), default='text', help='format of errors and warnings, json prints them as one JSON object per script (defaults to text)')
     parser.add_argument('-q', '--quiet', action='store_true', help='quiet mode that disables ASCII banner')
-    parser.add_argument('-o', dest='output', type=Path, metavar='OUTPUT', default='sketch', help='name or path to output directory, contains sketch')
+    parser.add_argument('--no-update-check', action='store_true', help='don\'t check for updates on PyPI (also disabled by PPARSER_NO_UPDATE_CHECK environment variable)')
+    parser.add_argument('-o', dest='output', type=Path, metavar='OUTPUT', default='sketch', help='name or path to output directory, contains sketch (or sketches, if several scripts are parsed)')
     parser.add_argument('-i', dest='indent', type=int, metavar='INDENT', default=2, help='number of spaces per indent in the output sketch')
+    parser.add_argument('-j', dest='jobs', type=int, metavar='N', default=1, help='number of scripts parsed in parallel, or number of processes parsing chunks of one script (see --chunk-size)')
+    parser.add_argument('--chunk-size', type=int, metavar='LINES', nargs='?', const=10000, help='split a single script to chunks of LINES lines parsed in parallel by -j processes (defaults to 10000)')
+
+    parser.add_argument('--cache', type=Path, metavar='DIR', nargs='?', const=checkpoints_dir(), help='enable incremental parsing, checkpoints are stored in DIR (defaults to the user cache directory)')
+    parser.add_argument('--cache-size', type=int, metavar='MB', default=256, help='maximum size of the cache in megabytes')
+    parser.add_argument('--clear-cache', action='store_true', help='remove all checkpoints from the cache before parsing')
+    parser.add_argument('--watch', action='store_true', help='keep running and recompile the script when it or alphabets are changed, only lines after the first changed one are parsed again')
+
+    parser.add_argument('-O', dest='optimize', type=int, choices=(0, 1, 2), metavar='LEVEL', default=0, help='optimization level of the generated code: 0 - none, 1 - fold delays, 2 - also merge strings (defaults to 0)')
+    parser.add_argument('--compress-loops', action='store_true', help='replace repeated sequences of commands with loops')
+    parser.add_argument('--progmem', action='store_true', help='store strings in flash memory (PROGMEM), so SRAM usage doesn\'t depend on the length of typed text')
+    parser.add_argument('--specialize', action='store_true', help='replace templates of payloads with functions over shared constant data and remove unused parameters to reduce flash size, estimated flash before and after is printed')
+
+    parser.add_argument('--layout', metavar='LAYOUT', help='type characters available on the keyboard layout of the target computer directly and the rest by Alt codes, LAYOUT is a name of the supplied layout (e.g. us) or path to JSON file')
+    parser.add_argument('--alt-encoding', choices=('auto', 'u16', 'u8', 'keys'), default='auto', help='encoding of Alt codes in the sketch, auto chooses u8 if all codes of the alphabets fit in 8 bits, even if the script doesn\'t use larger ones (defaults to auto)')
+    parser.add_argument('--encoding-report', action='store_true', help='print estimated flash size and CPU time on the device for each encoding of Alt codes')
+
+    parser.add_argument('--estimate', type=int, metavar='N', nargs='?', const=20, help='print estimated execution time of the payload on the device and N slowest lines (defaults to 20)')
+    parser.add_argument('--max-runtime', type=float, metavar='SECONDS', help='fail if estimated execution time of the payload exceeds SECONDS')
+    parser.add_argument('--timing', type=TimingModel.parse, metavar='MODEL', help='timing model of the device in format key=MS,report=MS,startup=MS (defaults to key=20,report=1,startup=2500)')
+
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const='-', help='print time of each parsing phase and command, or write it to FILE in JSON format')
 
     group = parser.add_mutually_exclusive_group()
     group.add_argument('-a', dest='alphabets', type=Path, metavar='ALPHABET', action='append', help='path to additional alphabets of Alt codes ', default=[])
     group.add_argument('--disable-alt', action='store_true', help='don\'t parse strings to Alt codes sequences')
 
-    args = parser.parse_args()
+    return parser
+
+
+def main(argv=argv[1:]):
+    """Main entrypoint of PotatoParser
+
+    Args:
+        argv (Optional[list]): Parser options, defaults to `sys.argv`
+    """
+    # Subcommands
+    if argv[:1] == ['bench']:
+        from .bench import main as bench_main
+        return bench_main(argv[1:])
+
+    if argv[:1] == ['serve']:
+        from .server import main as serve_main
+        return serve_main(argv[1:])
+
+    global _diagnostics_file
+
+    args = build_arg_parser().parse_args(argv)
+
+    init()
+
+    if args.diagnostics == 'json':
+        _diagnostics_file = sys.stdout
+
+    with redirect_stdout(sys.stderr) if args.diagnostics == 'json' else nullcontext():
+        if not args.quiet:
+            print(gen_art(not args.no_update_check))
 
-    if not args.quiet:
-        print(gen_art())
+        try:
+            _run(args)
+        finally:
+            # The cached remote version may be updating in the background
+            wait_remote_version()
+
+
+def _run(args):
+    """Parses the scripts according to the parsed command-line options
+
+    Args:
+        args (argparse.Namespace): parser options
+    """
+    global _alphabet
+
+    if args.clear_cache:
+        from .cache import CompilationCache
+        CompilationCache(args.cache or checkpoints_dir(), 0).clear()
 
     start = time()
-    pparser = PotatoParser(args)
+    profiler = Profiler() if args.profile else None
 
-    check_file(args.source)
+    # Alphabets are loaded once for all scripts
+    if not args.disable_alt:
+        try:
+            if profiler is not None:
+                _alphabet = profiler.timed('alphabet', load_alphabet)(args.alphabets)
+            else:
+                _alphabet = load_alphabet(args.alphabets)
+        except AlphabetError as e:
+            log_error(str(e))
+            exit(1)
 
-    with open(args.source, encoding='utf-8') as source:
-        for line in source:
-            pparser.exec(*line.rstrip().split(' ', 1))
-            pparser.i += 1
+    sources = expand_sources(args.sources)
 
-    pparser.sketch.flush()
-    log_success(f'Successfully parsed {pparser.i} line{"s" * bool(pparser.i - 1)} in {round((time() - start) * 1000)}ms')
+    # A single script is parsed exactly to the output directory
+    if len(args.sources) == 1 and len(sources) == 1 and not args.sources[0].is_dir():
+        args.source = sources[0]
+
+        if args.watch:
+            from .watch import watch
+            return watch(args, _alphabet)
+
+        pparser = compile_script(args, _alphabet, profiler)
+
+        log_success(f'Successfully parsed {pparser.i} line{"s" * bool(pparser.i - 1)} in {round((time() - start) * 1000)}ms')
+        return
+
+    if not sources:
+        log_error('There are no scripts to parse')
+        exit(1)
+
+    if args.watch:
+        log_error('Only one script can be watched')
+        exit(1)
+
+    if not compile_batch(args, sources):
+        exit(1)
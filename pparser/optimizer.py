@@ -0,0 +1,363 @@
+"""File containing the peephole optimizer of the generated IR nodes
+"""
+
+from .ir import Delay, Loop, Node, TypeAlt, TypeText
+
+
+class PeepholeOptimizer:
+    """Optimizes IR nodes generated by commands before they're rendered to
+    the sketch. Only the last simple node is kept back, so it can be merged
+    with the following one. Typing behaviour isn't changed
+
+    Levels:
+        - *0*: no optimization
+        - *1*: adjacent delays are folded to one delay and no-op nodes
+          (e.g. ``delay(0);``) are dropped
+        - *2*: consecutive strings of the same mode and delay per character
+          are also merged to one string
+
+    Unless strings are stored in flash memory (see ``--progmem``), merged
+    strings are limited to :attr:`max_string` characters, because the whole
+    string is built in SRAM on the device
+
+    Args:
+        level (int): optimization level
+        indent (int): number of spaces per indent in the sketch, it's used to
+            count saved bytes
+    """
+
+    max_string = 128
+
+    def __init__(self, level, indent):
+        self.level = level
+        self.indent = indent
+
+        # The last simple node, which can be merged with the following one
+        self.pending = None
+
+        # Number of saved statements and bytes of the sketch
+        self.statements = 0
+        self.bytes = 0
+
+    def attach(self, pparser):
+        """Attaches optimizer to the emitter and the sketch of the parser
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+        """
+        self.emitter = pparser.emitter
+        self.sketch = pparser.sketch
+
+        self._add = self.emitter.add
+        self._flush = self.sketch.flush
+
+        self.emitter.add = self.add
+        self.sketch.flush = self.flush
+
+        # Strings in flash memory don't take SRAM
+        if pparser.args.progmem:
+            self.max_string = float('inf')
+
+    def overhead(self, node):
+        """Returns the size of the statement of the node in the sketch,
+        except the content of the string
+        """
+        size = self.indent + 1
+
+        if isinstance(node, Delay):
+            return size + len(f'delay({node.ms});')
+
+        size += 0 if node.delay is None else len(f', {node.delay}')
+
+        if isinstance(node, TypeText):
+            return size + len('printDefaultString(F(""));')
+
+        return size + len(self.emitter.alt_payloads[self.emitter.translator.encoding][0].__name__) + len('({});')
+
+    def is_noop(self, node):
+        """Checks whether the node does nothing
+        """
+        if isinstance(node, Delay):
+            return not node.ms
+        if isinstance(node, TypeAlt):
+            return not node.codes
+        if isinstance(node, TypeText):
+            return not node.text
+        return False
+
+    def merge(self, first, second):
+        """Merges two nodes, if it's possible
+
+        Returns:
+            Union[pparser.ir.Node, None]: merged node or ``None``
+        """
+        if type(first) is not type(second):
+            return None
+
+        if isinstance(first, Delay):
+            self.bytes += self.overhead(first) + self.overhead(second) - self.overhead(Delay(first.ms + second.ms))
+            return Delay(first.ms + second.ms)
+
+        if self.level < 2 or not isinstance(first, (TypeAlt, TypeText)) or first.delay != second.delay:
+            return None
+
+        if isinstance(first, TypeAlt):
+            if len(first.codes) + len(second.codes) > self.max_string:
+                return None
+
+            # Separator of the codes is added
+            self.bytes += self.overhead(second) - 2
+            return TypeAlt(first.codes + second.codes, first.delay)
+
+        if isinstance(first, TypeText):
+            if len(first.text) + len(second.text) > self.max_string:
+                return None
+
+            self.bytes += self.overhead(second)
+            return TypeText(first.text + second.text, first.delay)
+
+        return None
+
+    def fold(self, nodes):
+        """Optimizes the sequence of nodes, which doesn't depend on the
+        other nodes (e.g. the body of the loop)
+
+        Args:
+            nodes (Iterable[pparser.ir.Node]): nodes to optimize
+
+        Returns:
+            list: optimized nodes
+        """
+        folded = []
+
+        for node in nodes:
+            if isinstance(node, Loop):
+                node = Loop(node.n, tuple(self.fold(node.body)))
+            elif self.is_noop(node):
+                self.statements += 1
+                self.bytes += self.overhead(node)
+                continue
+
+            if folded:
+                merged = self.merge(folded[-1], node)
+
+                if merged is not None:
+                    self.statements += 1
+                    folded[-1] = merged
+                    continue
+
+            folded.append(node)
+
+        return folded
+
+    def add(self, nodes):
+        """Adds nodes generated by the command to the sketch, optimizing them
+
+        Args:
+            nodes (list): IR nodes, the code in the special format (see
+                :class:`pparser.payloads.Payload`) isn't optimized
+        """
+        if not nodes:
+            return
+
+        # Nodes which can't be merged (e.g. key presses) are just kept in
+        # place, so only the code generated directly breaks the sequence
+        if not all(isinstance(node, Node) for node in nodes):
+            self.emit()
+            self._add(nodes)
+            return
+
+        if self.pending is not None:
+            nodes = [self.pending, *nodes]
+            self.pending = None
+
+        nodes = self.fold(nodes)
+
+        # The last simple node is kept back
+        if nodes and isinstance(nodes[-1], (Delay, TypeAlt, TypeText)):
+            self.pending = nodes.pop()
+
+        self._add(nodes)
+
+    def emit(self):
+        """Adds the pending node to the sketch
+        """
+        if self.pending is not None:
+            self._add([self.pending])
+            self.pending = None
+
+    def flush(self):
+        """Adds the pending node and writes the sketch
+        """
+        self.emit()
+        self._flush()
+
+    def get_state(self):
+        """Returns the state of the optimizer (see :meth:`pparser.parser.PotatoParser.get_state`)
+        """
+        return self.pending, self.statements, self.bytes
+
+    def set_state(self, state):
+        """Restores the state of the optimizer returned by :meth:`get_state`
+        """
+        self.pending, self.statements, self.bytes = state
+
+
+class LoopCompressor:
+    """Finds repeated contiguous sequences of IR nodes (e.g. 200 ``DOWN``
+    or repeated ``TAB``, ``STRING``, ``ENTER`` blocks) and replaces them
+    with loops, in the same way as **REPEAT** does
+
+    Nodes are buffered in a window of :attr:`window` nodes. For each node,
+    sequences of up to :attr:`max_period` nodes starting from it are compared
+    with the following ones by hashes of nodes, and the sequence which saves
+    the most statements is chosen. Sequences are replaced only if at least 3
+    statements are saved, because the loop itself takes 2 lines
+    """
+
+    window = 4096
+    max_period = 32
+
+    # Limit of repetitions, so the counter of the loop doesn't overflow
+    max_repeats = 10000
+
+    def __init__(self):
+        # Buffered nodes and their hashes
+        self.nodes = []
+        self.hashes = []
+
+        # Number of replaced statements and generated loops
+        self.statements = 0
+        self.loops = 0
+
+    def attach(self, pparser):
+        """Attaches compressor to the emitter and the sketch of the parser,
+        it must be attached after :class:`PeepholeOptimizer`
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+        """
+        self.emitter = pparser.emitter
+        self.sketch = pparser.sketch
+
+        self._add = self.emitter.add
+        self._flush = self.sketch.flush
+
+        self.emitter.add = self.add
+        self.sketch.flush = self.flush
+
+    def add(self, nodes):
+        """Adds nodes generated by the command to the buffer
+
+        Args:
+            nodes (list): IR nodes, the code in the special format (see
+                :class:`pparser.payloads.Payload`) isn't compressed
+        """
+        if not nodes:
+            return
+
+        if not all(isinstance(node, Node) for node in nodes):
+            self.compress(True)
+            self._add(nodes)
+            return
+
+        self.nodes += nodes
+        self.hashes += map(hash, nodes)
+
+        if len(self.nodes) >= self.window:
+            self.compress(False)
+
+    def find(self, i):
+        """Finds the best repeated sequence starting from the node
+
+        Args:
+            i (int): index of the node in the buffer
+
+        Returns:
+            Tuple[int, int]: length of the sequence and number of its repetitions
+        """
+        nodes, hashes = self.nodes, self.hashes
+        n = len(nodes)
+        best = (0, 1)
+
+        # Sequences can repeat only if the first node is repeated
+        following = hashes[i + 1:i + 1 + min(self.max_period, (n - i) // 2)]
+        first = hashes[i]
+        p = 0
+
+        while True:
+            try:
+                p = following.index(first, p) + 1
+            except ValueError:
+                break
+
+            pattern = hashes[i:i + p]
+            block = nodes[i:i + p]
+            j = i + p
+
+            while j + p <= n and hashes[j:j + p] == pattern and nodes[j:j + p] == block:
+                j += p
+
+            k = min((j - i) // p, self.max_repeats)
+
+            if p * (k - 1) > best[0] * (best[1] - 1):
+                best = (p, k)
+
+        return best
+
+    def compress(self, final):
+        """Compresses buffered nodes and adds them to the sketch
+
+        Args:
+            final (bool): whether there are no more nodes, otherwise nodes at
+                the end of the buffer are kept, because their sequences can
+                continue
+        """
+        nodes = self.nodes
+        n = len(nodes)
+        out = []
+        i = 0
+
+        while i < n:
+            if not final and i > n - 2 * self.max_period:
+                break
+
+            p, k = self.find(i)
+
+            if p * (k - 1) < 3:
+                out.append(nodes[i])
+                i += 1
+                continue
+
+            # The sequence can continue after the end of the buffer
+            if not final and i > 0 and i + p * (k + 1) > n:
+                break
+
+            out.append(Loop(k, tuple(nodes[i:i + p])))
+            self.statements += p * (k - 1)
+            self.loops += 1
+            i += p * k
+
+        del self.nodes[:i]
+        del self.hashes[:i]
+
+        self._add(out)
+
+    def flush(self):
+        """Compresses the rest of nodes and writes the sketch
+        """
+        self.compress(True)
+        self._flush()
+
+    def get_state(self):
+        """Returns the state of the compressor (see :meth:`pparser.parser.PotatoParser.get_state`).
+        Hashes aren't included, because hashes of strings differ between processes
+        """
+        return list(self.nodes), self.statements, self.loops
+
+    def set_state(self, state):
+        """Restores the state of the compressor returned by :meth:`get_state`
+        """
+        nodes, self.statements, self.loops = state
+        self.nodes = list(nodes)
+        self.hashes = list(map(hash, self.nodes))
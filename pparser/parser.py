@@ -1,14 +1,16 @@
 """File containing a class responsible for parsing commands
 """
 
-from json import load
-from pathlib import Path
-from sys import exit
+from collections import deque
 
+from .alphabet import AltTranslator, load_alphabet
+from .estimator import Estimator, TimingModel
+from .layout import load_layout
 from .commands import *
-from .exceptions import PotatoParserError, PotatoParserWarning
-from .sketch import Sketch
-from .utils import log_error, log_info, check_file
+from .diagnostics import Diagnostic, Diagnostics
+from .exceptions import CommandArgumentError, PotatoParserError, PotatoParserWarning
+from .sketch import CppEmitter, Sketch
+from .specializer import Specializer
 
 
 class PotatoParser:
@@ -17,9 +19,11 @@ class PotatoParser:
 
     Args:
         args (argparse.Namespace): arguments obtained by :class:`argparse.ArgumentParser`
+        alphabet (Optional[dict]): already loaded alphabet of Alt codes (see
+            :func:`pparser.alphabet.load_alphabet`), loaded from **args** if not specified
     """
 
-    def __init__(self, args):
+    def __init__(self, args, alphabet=None):
         self.args = args
 
         # Create `Sketch` instance to control output sketch
@@ -28,31 +32,87 @@ class PotatoParser:
         # Line on which the parser is currently looking
         self.i = 0
 
-        # List of already processed commands (it is necessary to
-        # repeat commands such as `DEFAULTDELAY`)
-        self.processed_commands = []
+        # History of already processed commands. It's bounded, because
+        # `REPEAT` can't look back more than 100 commands
+        self.processed_commands = deque(maxlen=100)
+
+        # Commands which must be repeated after each subsequent
+        # command (such as `DEFAULTDELAY`)
+        self.repeated_commands = []
+
+        # Comment shared by all skipped lines with `REM` (see `skip_lines`)
+        self.rem = REM(None, self)
 
         # Generate alphabet dictionary of Alt codes, if they aren't disabled
         if not args.disable_alt:
-            self.alphabet = {}
+            self.alphabet = load_alphabet(args.alphabets) if alphabet is None else alphabet
+            self.translator = AltTranslator(self.alphabet, args.alt_encoding)
+
+        # Keyboard layout of the target computer, characters available on
+        # it are typed directly instead of Alt codes
+        self.layout = None
+
+        if args.layout and not args.disable_alt:
+            self.layout = load_layout(args.layout)
+
+        # Replace templates of payloads with functions over shared constant
+        # data, it must be assigned before the emitter is created
+        if args.specialize:
+            self.sketch.specializer = Specializer()
+
+        # Renders IR nodes generated by commands to the sketch
+        self.emitter = CppEmitter(self.sketch, getattr(self, 'translator', None), args.progmem)
+
+        # Parse the script in chunks in parallel, the stitch pass is attached
+        # before optimizers to get nodes generated by commands as is
+        self.chunked = None
+
+        if args.chunk_size:
+            # Optional passes are imported only when they're enabled, so
+            # they don't slow down startup
+            from .chunked import ChunkedParser
+
+            self.chunked = ChunkedParser(args.chunk_size)
+            self.chunked.attach(self)
 
-            # First load the alphabets supplied by default...
-            for path in (Path(__file__).parent / 'alphabets').glob('*.json'):
-                with open(path, encoding='utf-8') as file:
-                    self.alphabet.update(load(file))
+        # Optimize generated nodes before they're rendered
+        self.optimizer = None
 
-            # ...then specified by the user
-            for path in args.alphabets:
-                # Don't forget to check if file is already exists
-                check_file(path)
+        if args.optimize:
+            from .optimizer import PeepholeOptimizer
 
-                with open(path, encoding='utf-8') as file:
-                    self.alphabet.update(load(file))
+            self.optimizer = PeepholeOptimizer(args.optimize, args.indent)
+            self.optimizer.attach(self)
 
-        # Redefining `_log_func` funcitons of exceptions
-        # Not clear method, but working
-        PotatoParserError._log_func = self.log_error
-        PotatoParserWarning._log_func = self.log_info
+        # Replace repeated sequences of nodes with loops, it's attached
+        # last, so nodes are compressed before they're optimized
+        self.compressor = None
+
+        if args.compress_loops:
+            from .optimizer import LoopCompressor
+
+            self.compressor = LoopCompressor()
+            self.compressor.attach(self)
+
+        # Estimate execution time on the device, it's attached after the
+        # optimizers to see nodes generated by commands
+        self.estimator = None
+
+        if args.estimate or args.max_runtime is not None:
+            self.estimator = Estimator(args.timing or TimingModel(), args.estimate or 0)
+            self.estimator.attach(self)
+
+        # Whether the script was parsed without errors
+        self.is_success = True
+
+        # Errors and warnings are collected and printed after parsing. Without
+        # `--error-ok` parsing is aborted at the first error
+        max_errors = getattr(args, 'max_errors', None)
+
+        if max_errors is None and not args.error_ok:
+            max_errors = 1
+
+        self.diagnostics = Diagnostics(max_errors)
 
     def exec(self, cmd, arg=None):
         """The method that is called to parse the current line of the script.
@@ -71,52 +131,197 @@ class PotatoParser:
         if not cmd:
             return
 
-        # Find command by iterating through the names of defined commands
-        for command in DuckyCommand.__subclasses__():
-            if command.__name__.isupper() and cmd == command.__name__:
-                # Create an instance of the command
-                command = command(arg, self)
-
-                try:
-                    # Try to execute the command
-                    out = command.exec()
-                except (PotatoParserWarning, PotatoParserError) as e:
-                    # Logs error, if it's occurred
-                    e.log()
-                else:
-                    # On success add command output to sketch
-                    self.sketch.add_text(out)
+        command = self.make_command(cmd, arg)
 
-                    for payload in command.payloads:
-                        self.sketch.add_payload(payload)
+        if command is not None:
+            try:
+                # Try to execute the command
+                out = self.exec_command(command)
+            except (PotatoParserWarning, PotatoParserError) as e:
+                # Logs error, if it's occurred
+                self.log_exception(e, cmd)
+            else:
+                # On success add command output to sketch
+                command.ir = out
+                self.emitter.add(out)
 
-                self.processed_commands.append(command)
+                for payload in command.payloads:
+                    self.sketch.add_payload(payload)
 
-                # Repeat processed commands
-                for processed_command in self.processed_commands:
-                    try:
-                        self.sketch.add(processed_command.repeat_exec())
-                    except Exception:
-                        pass
+                if command.repeated:
+                    self.repeated_commands.append(command)
 
-                return
+            self.processed_commands.append(command)
+
+            self.repeat_commands()
+            return
 
         # The specified command doesn't exist, so we will add `UndefinedCommand`
         # instead of this to `processed_commands`
         self.processed_commands.append(UndefinedCommand(arg, self))
-        self.log_error(f'Undefined command: `{cmd}`')
+        self.log_error(f'Undefined command: `{cmd}`', 'E101')
+
+    def repeat_commands(self):
+        """Repeats commands which are waiting for it after each command
+        (see :attr:`pparser.commands.DuckyCommand.repeated`)
+        """
+        for repeated_command in self.repeated_commands:
+            try:
+                self.emitter.add(repeated_command.repeat_exec())
+            except (PotatoParserWarning, PotatoParserError) as e:
+                self.log_exception(e)
+
+    def make_command(self, cmd, arg):
+        """Finds command by its name in the registry of defined commands
+        and creates an instance of it
+
+        Args:
+            cmd (str): command name
+            arg (Union[str, None]): the arguments of the command
+
+        Returns:
+            Union[pparser.commands.DuckyCommand, None]: instance of the command
+                or ``None`` if command with such name doesn't exist
+        """
+        command = get_command(cmd)
 
-    def log_error(self, msg):
-        """Small wrap of the original :func:`log_error` function
+        if command is not None:
+            return command(arg, self)
+
+    def exec_command(self, command):
+        """Executes the command (see :meth:`pparser.commands.DuckyCommand.exec`)
+
+        Args:
+            command (pparser.commands.DuckyCommand): command to execute
+
+        Returns:
+            list: Generated Arduino code
+        """
+        return command.exec()
+
+    def exec_line(self, line):
+        """Parses the next line of the script
+
+        Args:
+            line (str): line of the script
         """
-        log_error(f'{msg} (line {self.i + 1})')
+        self.exec(*line.rstrip().split(' ', 1))
+        self.i += 1
 
-        if self.args.error_ok:
-            self.is_success = False
+    def skip_lines(self, run):
+        """Skips blank lines and comments of the script, which are found
+        without tokenization (see :func:`pparser.reader.tokenize`). Comments
+        are added to the history of processed commands as one shared **REM**
+        command, because its argument doesn't matter
+
+        Args:
+            run (bytes): blank lines and comments encoded in UTF-8
+        """
+        rems = run.count(b'\nREM') + run.startswith(b'REM')
+
+        if rems and self.repeated_commands:
+            # Repeated commands must be called after each comment
+            for line in run.split(b'\n')[:-1]:
+                if line[:3] == b'REM':
+                    self.exec_line('REM')
+                else:
+                    self.i += 1
+
+            return
+
+        self.processed_commands.extend([self.rem] * min(rems, self.processed_commands.maxlen))
+        self.i += run.count(b'\n')
+
+    def get_state(self):
+        """Returns the state of the parser after the processed lines. It can
+        be pickled, so parsing can be resumed later with :meth:`set_state`
+
+        Returns:
+            dict: state of the parser
+        """
+        return {
+            'i': self.i,
+            'processed_commands': self.processed_commands,
+            'repeated_commands': self.repeated_commands,
+            'is_success': self.is_success,
+            'payloads': self.sketch.payloads,
+            'data_names': self.sketch.data_names,
+            'alt_stats': None if self.args.disable_alt else self.translator.stats,
+            'optimizer': None if self.optimizer is None else self.optimizer.get_state(),
+            'compressor': None if self.compressor is None else self.compressor.get_state(),
+            'estimator': None if self.estimator is None else self.estimator.get_state(),
+            'specializer': None if self.sketch.specializer is None else self.sketch.specializer.get_state()
+        }
+
+    def set_state(self, state):
+        """Restores the state of the parser returned by :meth:`get_state`
+
+        Args:
+            state (dict): state of the parser
+        """
+        self.i = state['i']
+        self.processed_commands = state['processed_commands']
+        self.repeated_commands = state['repeated_commands']
+        self.is_success = state['is_success']
+        self.sketch.payloads = state['payloads']
+        self.sketch.data_names = state['data_names']
+
+        if not self.args.disable_alt:
+            self.translator.stats = state['alt_stats']
+
+        if self.optimizer is not None:
+            self.optimizer.set_state(state['optimizer'])
+
+        if self.compressor is not None:
+            self.compressor.set_state(state['compressor'])
+
+        if self.estimator is not None:
+            self.estimator.set_state(state['estimator'])
+
+        if self.sketch.specializer is not None:
+            self.sketch.specializer.set_state(state['specializer'])
+
+        for command in (*self.processed_commands, *self.repeated_commands):
+            command._pparser = self
+
+    def log_exception(self, e, cmd=None):
+        """Logs error or warning raised by the command
+
+        Args:
+            e (Union[PotatoParserError, PotatoParserWarning]): error or warning
+            cmd (Optional[str]): name of the command which has raised it
+        """
+        # Errors of arguments point to the argument, the others to the command
+        column = len(cmd) + 2 if cmd is not None and isinstance(e, CommandArgumentError) else 1
+
+        if isinstance(e, PotatoParserError):
+            e._log_func = lambda msg: self.log_error(msg, e.code, column)
         else:
-            exit(1)
+            e._log_func = lambda msg: self.log_info(msg, e.code, column)
 
-    def log_info(self, msg):
-        """Small wrap of the original :func:`log_info` function
+        e.log()
+
+    def log_error(self, msg, code=PotatoParserError.code, column=1):
+        """Adds error of the current line to :attr:`diagnostics`
+
+        Args:
+            msg (str): message
+            code (str): code of the error
+            column (int): column of the line, starting from 1
+
+        Raises:
+            ParsingAborted: the limit of errors is reached (or errors aren't
+                allowed by the options)
+        """
+        self.is_success = False
+        self.diagnostics.add(Diagnostic('error', code, self.i + 1, column, msg))
+
+    def log_info(self, msg, code=PotatoParserWarning.code, column=1):
+        """Adds warning of the current line to :attr:`diagnostics`
+
+        Args:
+            msg (str): message
+            code (str): code of the warning
+            column (int): column of the line, starting from 1
         """
-        log_info(f'{msg} (line {self.i + 1})')
+        self.diagnostics.add(Diagnostic('info', code, self.i + 1, column, msg))
@@ -71,6 +71,19 @@ class pressComboKey(Payload):
     ]
 
 
+class pressComboKeyP(Payload):
+    header = 'void pressComboKeyP(const uint8_t *keys, size_t n);'
+    text = [
+        'void pressComboKeyP(const uint8_t *keys, size_t n) {',
+        [
+            'for (size_t j = 0; j < n; ++j) Keyboard.press(pgm_read_byte(keys + j));',
+            'delay(20);',
+            'Keyboard.releaseAll();'
+        ],
+        '}'
+    ]
+
+
 class printAltString(Payload):
     header = '''uint16_t operator ""_S(unsigned long long x);
 template <size_t N> void printAltString(const uint16_t (&codes)[N], int delayTec = 0);'''
@@ -106,6 +119,61 @@ template <size_t N> void printAltString(const uint16_t (&codes)[N], int delayTec
     ]
 
 
+class printAltString8(Payload):
+    header = 'template <size_t N> void printAltString8(const uint8_t (&codes)[N], int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'template <size_t N> void printAltString8(const uint8_t (&codes)[N], int delayTec) {',
+        [
+            'for (uint8_t code : codes) {',
+            [
+                'int d = 1;',
+                'while (d <= code / 10) d *= 10;',
+                'Keyboard.press(KEY_LEFT_ALT);',
+                'for (int i = d; i > 0; i /= 10) {',
+                [
+                    'byte k = (code / i % 10 == 0 ? 234 : code / i % 10 + 224);',
+                    'pressSingleKey(k);',
+                    'delay(delayTec);'
+                ],
+                '}',
+                'Keyboard.release(KEY_LEFT_ALT);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
+
+
+class printAltKeys(Payload):
+    header = 'template <size_t N> void printAltKeys(const uint8_t (&keys)[N], int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'template <size_t N> void printAltKeys(const uint8_t (&keys)[N], int delayTec) {',
+        [
+            'bool alt = false;',
+            'for (uint8_t k : keys) {',
+            [
+                'if (!k) {',
+                [
+                    'Keyboard.release(KEY_LEFT_ALT);',
+                    'alt = false;',
+                    'continue;'
+                ],
+                '}',
+                'if (!alt) Keyboard.press(KEY_LEFT_ALT);',
+                'alt = true;',
+                'pressSingleKey(k);',
+                'delay(delayTec);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
+
+
 class printDefaultString(Payload):
     header = 'void printDefaultString(String string, int delayTec = 0);'
     depends = [pressSingleKey]
@@ -122,3 +190,107 @@ class printDefaultString(Payload):
         ],
         '}'
     ]
+
+
+class printAltStringP(Payload):
+    header = 'void printAltStringP(const uint16_t *codes, size_t n, int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'void printAltStringP(const uint16_t *codes, size_t n, int delayTec) {',
+        [
+            'for (size_t j = 0; j < n; ++j) {',
+            [
+                'uint16_t code = pgm_read_word(codes + j);',
+                'int d = 1;',
+                'while (d <= code / 10) d *= 10;',
+                'Keyboard.press(KEY_LEFT_ALT);',
+                'for (int i = d; i > 0; i /= 10) {',
+                [
+                    'byte k = (code / i % 10 == 0 ? 234 : code / i % 10 + 224);',
+                    'pressSingleKey(k);',
+                    'delay(delayTec);'
+                ],
+                '}',
+                'Keyboard.release(KEY_LEFT_ALT);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
+
+
+class printDefaultStringP(Payload):
+    header = 'void printDefaultStringP(const __FlashStringHelper *string, int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'void printDefaultStringP(const __FlashStringHelper *string, int delayTec) {',
+        [
+            'PGM_P p = reinterpret_cast<PGM_P>(string);',
+            'for (char c = pgm_read_byte(p); c; c = pgm_read_byte(++p)) {',
+            [
+                'pressSingleKey(c);',
+                'delay(delayTec);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
+
+
+class printAltString8P(Payload):
+    header = 'void printAltString8P(const uint8_t *codes, size_t n, int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'void printAltString8P(const uint8_t *codes, size_t n, int delayTec) {',
+        [
+            'for (size_t j = 0; j < n; ++j) {',
+            [
+                'uint8_t code = pgm_read_byte(codes + j);',
+                'int d = 1;',
+                'while (d <= code / 10) d *= 10;',
+                'Keyboard.press(KEY_LEFT_ALT);',
+                'for (int i = d; i > 0; i /= 10) {',
+                [
+                    'byte k = (code / i % 10 == 0 ? 234 : code / i % 10 + 224);',
+                    'pressSingleKey(k);',
+                    'delay(delayTec);'
+                ],
+                '}',
+                'Keyboard.release(KEY_LEFT_ALT);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
+
+
+class printAltKeysP(Payload):
+    header = 'void printAltKeysP(const uint8_t *keys, size_t n, int delayTec = 0);'
+    depends = [pressSingleKey]
+
+    text = [
+        'void printAltKeysP(const uint8_t *keys, size_t n, int delayTec) {',
+        [
+            'bool alt = false;',
+            'for (size_t j = 0; j < n; ++j) {',
+            [
+                'uint8_t k = pgm_read_byte(keys + j);',
+                'if (!k) {',
+                [
+                    'Keyboard.release(KEY_LEFT_ALT);',
+                    'alt = false;',
+                    'continue;'
+                ],
+                '}',
+                'if (!alt) Keyboard.press(KEY_LEFT_ALT);',
+                'alt = true;',
+                'pressSingleKey(k);',
+                'delay(delayTec);'
+            ],
+            '}'
+        ],
+        '}'
+    ]
@@ -0,0 +1,189 @@
+"""File containing the profiler of the parsing process
+"""
+
+from json import dump
+from time import perf_counter
+import tracemalloc
+
+
+class Profiler:
+    """Collects time of each parsing phase and of each command class. It's
+    attached to the parser by wrapping methods of its instances, so parsing
+    without profiler isn't slowed down. Peak memory is traced too, note that
+    tracing of memory slows down parsing itself
+
+    Phases:
+        - *alphabet*: loading of alphabets
+        - *read*: reading lines of the script
+        - *dispatch*: finding commands and creating their instances
+        - *translate*: lookup of characters in the alphabet
+        - *payloads*: resolving payloads required by commands
+        - *render*: rendering of IR nodes generated by commands to the sketch
+        - *repeat*: repeating commands after each command (e.g. **DEFAULTDELAY**)
+        - *flush*: rendering and writing the final sketch to the file
+
+    Time of nested phases is also included into the outer ones, e.g. *translate*
+    is a part of parsing and execution time of **STRING** commands
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+        # Command name -> [count, parse time, exec time]
+        self.commands = {}
+
+        self.start = perf_counter()
+        tracemalloc.start()
+
+    def add(self, phase, seconds):
+        """Adds time to the phase
+
+        Args:
+            phase (str): name of the phase
+            seconds (float): spent time
+        """
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    def timed(self, phase, func):
+        """Wraps function, time of its calls is added to the phase
+
+        Args:
+            phase (str): name of the phase
+            func (Callable): function to wrap
+
+        Returns:
+            Callable: wrapped function
+        """
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter() - start)
+
+        return wrapper
+
+    def timed_iter(self, phase, iterable):
+        """Wraps iterable, time of getting each item is added to the phase
+
+        Args:
+            phase (str): name of the phase
+            iterable (Iterable): iterable to wrap
+
+        Yields:
+            any: items of the iterable
+        """
+        iterator = iter(iterable)
+
+        while True:
+            start = perf_counter()
+
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, perf_counter() - start)
+
+            yield item
+
+    def _exec_command(self, command):
+        """Executes the command by the wrapped method of the parser, measuring
+        parsing of its argument and execution separately. Commands executed
+        by the workers (see :class:`pparser.chunked.ChunkedParser`) are only
+        counted, because their results are already available
+        """
+        stats = self.commands.setdefault(type(command).__name__, [0, 0, 0])
+        stats[0] += 1
+
+        parse_arg = command._parse_arg
+        parse_time = 0
+
+        def timed_parse_arg():
+            nonlocal parse_time
+            start = perf_counter()
+
+            try:
+                return parse_arg()
+            finally:
+                parse_time += perf_counter() - start
+
+        # Parsing of the argument is measured for this instance only
+        command._parse_arg = timed_parse_arg
+        start = perf_counter()
+
+        try:
+            return self._exec(command)
+        finally:
+            del command._parse_arg
+
+            stats[1] += parse_time
+            stats[2] += perf_counter() - start - parse_time
+
+    def attach(self, pparser):
+        """Attaches profiler to the instance of the parser
+
+        Args:
+            pparser (pparser.parser.PotatoParser): instance of PotatoParser
+        """
+        pparser.make_command = self.timed('dispatch', pparser.make_command)
+
+        # Wrappers of the other components (e.g. the stitch pass of chunked
+        # parsing) are kept
+        self._exec = pparser.exec_command
+        pparser.exec_command = self._exec_command
+
+        pparser.emitter.add = self.timed('render', pparser.emitter.add)
+        pparser.sketch.add_payload = self.timed('payloads', pparser.sketch.add_payload)
+        pparser.sketch.flush = self.timed('flush', pparser.sketch.flush)
+
+        if hasattr(pparser, 'translator'):
+            pparser.translator.missing = self.timed('translate', pparser.translator.missing)
+            pparser.translator.translate = self.timed('translate', pparser.translator.translate)
+
+        pparser.repeat_commands = self.timed('repeat', pparser.repeat_commands)
+
+    def report(self):
+        """Stops the profiler and generates the report
+
+        Returns:
+            dict: the report
+        """
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'total': perf_counter() - self.start,
+            'peak_memory': peak,
+            'phases': dict(sorted(self.phases.items(), key=lambda x: -x[1])),
+            'commands': {
+                name: {'count': count, 'parse': parse, 'exec': exec_time}
+                for name, (count, parse, exec_time) in sorted(self.commands.items(), key=lambda x: -x[1][1] - x[1][2])
+            }
+        }
+
+    def dump(self, path):
+        """Writes the report in JSON format
+
+        Args:
+            path (pathlib.Path): path to the JSON file
+        """
+        with open(path, 'w') as file:
+            dump(self.report(), file, indent=4)
+
+    def print(self):
+        """Prints the report as a table sorted by spent time
+        """
+        report = self.report()
+
+        print(f'Total: {report["total"] * 1000:.1f}ms, peak memory: {report["peak_memory"] / (1 << 20):.2f}MB')
+        print(f'{"Phase":<24}{"Time, ms":>12}')
+
+        for phase, seconds in report['phases'].items():
+            print(f'{phase:<24}{seconds * 1000:>12.1f}')
+
+        print(f'{"Command":<24}{"Count":>12}{"Parse, ms":>12}{"Exec, ms":>12}')
+
+        for name, stats in report['commands'].items():
+            print(f'{name:<24}{stats["count"]:>12}{stats["parse"] * 1000:>12.1f}{stats["exec"] * 1000:>12.1f}')
@@ -0,0 +1,154 @@
+"""File containing the reader of scripts, which skips comments and blank
+lines without their tokenization
+"""
+
+from mmap import ACCESS_READ, PAGESIZE, mmap
+import os
+import re
+
+# Advice to drop pages of the mapped file, it's not supported on Windows
+try:
+    from mmap import MADV_DONTNEED
+except ImportError:
+    MADV_DONTNEED = None
+
+
+# Runs of blank lines and comments (REM) after the line break. Blank lines
+# and comments with unusual whitespace characters aren't matched, so they
+# are processed by the parser as usual
+_skipped = re.compile(rb'\n((?:(?:[ \t\f\v]*|REM(?: [^\n]*)?)\r?\n)+)')
+
+# The same runs at the beginning of the window
+_skipped_first = re.compile(rb'(?:(?:[ \t\f\v]*|REM(?: [^\n]*)?)\r?\n)+')
+
+# Carriage return, which isn't a part of CRLF, also ends the line
+_single_cr = re.compile(rb'\r(?!\n)')
+
+# Any line break
+_line_break = re.compile(rb'\r\n?|\n')
+
+# Approximate size of the window of the script processed at once in bytes,
+# so memory usage doesn't depend on the size of the script
+_window = 1 << 18
+
+
+def _windows(buffer):
+    """Splits the script to windows of about :data:`_window` bytes, which are
+    cut after line breaks
+
+    Yields:
+        Tuple[int, int]: start and end of the window
+    """
+    start, end = 0, len(buffer)
+
+    while start < end:
+        stop = start + _window
+
+        if stop >= end:
+            stop = end
+        else:
+            cut = max(buffer.rfind(b'\n', start, stop), buffer.rfind(b'\r', start, stop))
+
+            if cut >= 0:
+                # CRLF isn't split
+                stop = cut + 1 + (buffer[cut:cut + 2] == b'\r\n')
+            else:
+                # The line is longer than the window
+                match = _line_break.search(buffer, stop)
+                stop = end if match is None else match.end()
+
+        yield start, stop
+        start = stop
+
+
+def _split(buffer, start, end):
+    """Decodes lines of the script in the same way as the file opened in text
+    mode, but without line breaks at the end of lines
+
+    Returns:
+        List[str]: decoded lines
+    """
+    text = buffer[start:end].decode('utf-8')
+
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+    lines = text.split('\n')
+
+    # The last line break doesn't start a new line
+    if not lines[-1]:
+        lines.pop()
+
+    return lines
+
+
+def _release(buffer, start, end):
+    """Drops already processed pages of the memory-mapped file, so they
+    aren't kept in memory of the process
+    """
+    start -= start % PAGESIZE
+    end -= end % PAGESIZE
+
+    if end > start and MADV_DONTNEED is not None and hasattr(buffer, 'madvise'):
+        buffer.madvise(MADV_DONTNEED, start, end - start)
+
+
+def tokenize(buffer):
+    """Splits the script to blocks of lines, which must be parsed, and runs
+    of blank lines and comments, which are only counted by the parser (see
+    :meth:`pparser.parser.PotatoParser.skip_lines`). Both are found by the
+    regular expression and C-level methods of strings, so there is no work
+    for each skipped line in Python. The script is processed by windows, so
+    blocks and runs never exceed :data:`_window` bytes (unless the line is
+    longer)
+
+    Args:
+        buffer (Union[bytes, mmap.mmap]): the script encoded in UTF-8
+
+    Yields:
+        Union[List[str], bytes]: lines of the script (without line breaks)
+            or the run of skipped lines
+    """
+    for start, stop in _windows(buffer):
+        # Old Mac line endings are so rare, that they are just parsed as usual
+        if _single_cr.search(buffer, start, stop):
+            yield _split(buffer, start, stop)
+            _release(buffer, start, stop)
+            continue
+
+        pos = start
+        match = _skipped_first.match(buffer, pos, stop)
+
+        if match:
+            yield match.group()
+            pos = match.end()
+
+        for match in _skipped.finditer(buffer, pos, stop):
+            if match.start() + 1 > pos:
+                yield _split(buffer, pos, match.start() + 1)
+
+            yield match.group(1)
+            pos = match.end()
+
+        if pos < stop:
+            yield _split(buffer, pos, stop)
+
+        _release(buffer, start, stop)
+
+
+def read_script(path):
+    """Reads the script from the memory-mapped file (see :func:`tokenize`)
+
+    Args:
+        path (pathlib.Path): path to the script
+
+    Yields:
+        Union[List[str], bytes]: lines of the script or the run of skipped lines
+    """
+    with open(path, 'rb') as file:
+        # Empty file can't be mapped
+        if not os.fstat(file.fileno()).st_size:
+            return
+
+        with mmap(file.fileno(), 0, access=ACCESS_READ) as buffer:
+            yield from tokenize(buffer)
@@ -0,0 +1,187 @@
+"""File containing the compile server of PotatoParser. Run it with
+``pparser serve``
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, loads
+from pathlib import Path
+from time import perf_counter
+import asyncio
+import os
+import sys
+
+from .api import compile
+
+
+class CompileServer:
+    """Persistent server which parses scripts sent as JSON lines. Alphabets,
+    commands and rendered payloads stay loaded between jobs, so a job takes
+    only the time of parsing itself
+
+    Each request is a JSON object on a separate line:
+
+    .. code-block:: json
+
+        {"id": 1, "source": "STRING Hello World!", "options": {"indent": 4}}
+
+    and the response is a JSON object on a separate line too:
+
+    .. code-block:: json
+
+        {"id": 1, "success": true, "sketch": "...", "diagnostics": [], "lines": 1, "time_ms": 0.4}
+
+    Args:
+        jobs (int): maximum number of scripts parsed at once
+    """
+
+    def __init__(self, jobs):
+        self.executor = ThreadPoolExecutor(jobs)
+        self.semaphore = None
+        self.jobs = jobs
+
+    def _compile(self, request):
+        """Parses the script of the request, it's called in the thread pool
+
+        Args:
+            request (dict): request of the job
+
+        Returns:
+            dict: response to the request
+        """
+        start = perf_counter()
+        result = compile(request.get('source', ''), request.get('options'))
+
+        return {
+            'id': request.get('id'),
+            'success': result.success,
+            'sketch': result.sketch,
+            'diagnostics': [item.to_dict() for item in result.diagnostics],
+            'lines': result.lines,
+            'time_ms': round((perf_counter() - start) * 1000, 3)
+        }
+
+    async def handle(self, line):
+        """Handles one request
+
+        Args:
+            line (Union[str, bytes]): JSON line of the request
+
+        Returns:
+            str: JSON line of the response
+        """
+        try:
+            request = loads(line)
+            assert isinstance(request, dict), 'request must be an object'
+        except (ValueError, AssertionError) as e:
+            return dumps({'id': None, 'error': f'Invalid request: {e}'}) + '\n'
+
+        async with self.semaphore:
+            try:
+                response = await asyncio.get_event_loop().run_in_executor(self.executor, self._compile, request)
+            except Exception as e:
+                response = {'id': request.get('id'), 'error': f'{type(e).__name__}: {e}'}
+
+        return dumps(response, ensure_ascii=False) + '\n'
+
+    async def serve_stdio(self):
+        """Reads requests from stdin and writes responses to stdout, until
+        stdin is closed. Responses are written as soon as they are ready,
+        so their order can differ from the order of requests
+        """
+        self.semaphore = asyncio.Semaphore(self.jobs)
+        loop = asyncio.get_event_loop()
+        tasks = set()
+
+        async def respond(line):
+            sys.stdout.write(await self.handle(line))
+            sys.stdout.flush()
+
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+
+            if not line:
+                break
+
+            if line.strip():
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def serve_unix(self, path):
+        """Accepts connections on the Unix socket, each connection can send
+        any number of requests
+
+        Args:
+            path (pathlib.Path): path to the socket
+        """
+        self.semaphore = asyncio.Semaphore(self.jobs)
+
+        async def client(reader, writer):
+            lock = asyncio.Lock()
+
+            async def respond(line):
+                response = await self.handle(line)
+
+                async with lock:
+                    writer.write(response.encode())
+                    await writer.drain()
+
+            # Finished tasks are removed, so long connections don't keep them
+            tasks = set()
+
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                if line.strip():
+                    task = asyncio.ensure_future(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+
+            writer.close()
+
+        server = await asyncio.start_unix_server(client, str(path))
+
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=sys.argv[1:]):
+    """Entrypoint of the compile server
+
+    Args:
+        argv (Optional[list]): server options
+    """
+    parser = ArgumentParser(prog='pparser serve', description='Persistent server which parses Ducky Scripts sent as JSON lines')
+
+    parser.add_argument('--socket', type=Path, metavar='PATH', help='listen on the Unix socket instead of stdin/stdout')
+    parser.add_argument('-j', dest='jobs', type=int, metavar='N', default=os.cpu_count() or 1, help='maximum number of scripts parsed at once (defaults to the number of CPUs)')
+
+    args = parser.parse_args(argv)
+    server = CompileServer(args.jobs)
+
+    # Warm up alphabets and commands before the first job
+    compile('')
+
+    try:
+        if args.socket:
+            if args.socket.exists():
+                args.socket.unlink()
+
+            asyncio.run(server.serve_unix(args.socket))
+        else:
+            asyncio.run(server.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.socket and args.socket.exists():
+            args.socket.unlink()
@@ -1,37 +1,137 @@
 """File containing one class responsible for writing the output sketch
 """
 
-from collections import deque
+from hashlib import blake2b
+from io import StringIO
+from shutil import copyfileobj
+from tempfile import SpooledTemporaryFile
 import os
 
+from .ir import *
+from .payloads import *
+from .specializer import strip_delay
+
+
+# Rendered definitions of payloads, see `Sketch.render_payload`
+_rendered_payloads = {}
+
+# Transitive closures of payloads, see `payload_closure`
+_closures = {}
+
+
+def payload_closure(payload):
+    """Returns the payload together with all the payloads it depends on
+    (directly or not). Dependencies don't change, so the closure is computed
+    only once per payload
+
+    Args:
+        payload (pparser.payloads.Payload): the payload
+
+    Returns:
+        Tuple[pparser.payloads.Payload]: payloads of the closure, each payload
+            goes after its dependencies
+    """
+    closure = _closures.get(payload)
+
+    if closure is None:
+        closure = {}
+
+        for depend in payload.depends:
+            closure.update(dict.fromkeys(payload_closure(depend)))
+
+        closure[payload] = None
+        closure = _closures[payload] = tuple(closure)
+
+    return closure
+
+
+def payload_order(payloads):
+    """Orders payloads, so each payload goes after its dependencies and
+    independent payloads are sorted by name. The order doesn't depend on the
+    order in which payloads were added, so the same script always gives the
+    same sketch
+
+    Args:
+        payloads (Iterable[pparser.payloads.Payload]): payloads to order
+
+    Returns:
+        List[pparser.payloads.Payload]: ordered payloads
+    """
+    ordered = {}
+
+    for payload in sorted(payloads, key=lambda payload: payload.__name__):
+        ordered.update(dict.fromkeys(payload_closure(payload)))
+
+    return list(ordered)
+
 
 class Sketch:
     """Sketch object that has a number of methods that simplify working
     with the output file
 
     Args:
-        output (pathlib.Path): Path to the output sketch directory
+        output (Union[pathlib.Path, None]): Path to the output sketch directory.
+            If it's ``None``, the sketch is generated in memory without any
+            access to the filesystem (see :meth:`getvalue`)
         indent (int): The number of spaces contained in one indent
     """
 
+    # Maximum size (in characters) of the `setup` body kept in memory
+    # before it's rolled over to the temporary file on disk
+    spool_size = 1 << 20
+
     def __init__(self, output, indent):
-        output = output.absolute()
+        if output is None:
+            self.file = StringIO()
+            self.body = StringIO()
+            self.data = StringIO()
+        else:
+            output = output.absolute()
+
+            # Create directories if they haven't been created yet
+            os.makedirs(output, exist_ok=True)
+
+            # Output filename must be the same as parent directory
+            self.file = open(output / (output.name + '.ino'), 'w')
 
-        # Create directories if they haven't been created yet
-        os.makedirs(output, exist_ok=True)
+            # Body of `setup` function is streamed to the spooled file as soon
+            # as commands are processed, so memory usage doesn't depend on the
+            # size of the script. It will be spliced to the sketch on `flush`
+            self.body = SpooledTemporaryFile(max_size=self.spool_size, mode='w+', encoding='utf-8', newline='\n')
 
-        # Output filename must be the same as parent directory
-        self.file = open(output / (output.name + '.ino'), 'w')
+            # Constant data stored in flash memory is streamed in the same way
+            self.data = SpooledTemporaryFile(max_size=self.spool_size, mode='w+', encoding='utf-8', newline='\n')
 
         # Prepare variables
         self.indent = ' ' * indent
         self.payloads = set()
-        self.content = []
+
+        # Digests of added constant data and their names (see `add_data`)
+        self.data_names = {}
+
+        # Rendered text of the body and constant data is additionally
+        # collected here if they are lists (see `pparser.cache`)
+        self.record = None
+        self.record_data = None
+
+        # Specialization stage of payloads (see `pparser.specializer`), it's
+        # used if it's assigned before the sketch is filled
+        self.specializer = None
 
     def __del__(self):
         """The output file should be closed anyway
         """
         self.file.close()
+        self.body.close()
+        self.data.close()
+
+    def getvalue(self):
+        """Returns the generated sketch, if it's generated in memory
+
+        Returns:
+            str: text of the sketch
+        """
+        return self.file.getvalue()
 
     def add_text(self, text):
         """Adds text (C++ source) to the current sketch written in a special
@@ -42,58 +142,114 @@ class Sketch:
             text (str): Text to add
         """
         if text:
-            self.content.append(text)
+            self.add_rendered('\n'.join(self.make_indents(text, 1)) + '\n')
 
-    def add_payload(self, payload):
-        """Adds a payload to the current sketch
+    def add_rendered(self, text):
+        """Adds already rendered and indented text to the body of `setup`
 
         Args:
-            payload (pparser.payloads.Payload): payload to add
+            text (str): Text to add
         """
-        if payload:
-            used = {}
-            payloads = deque([payload])
+        self.body.write(text)
 
-            while payloads:
-                payload = payloads.popleft()
+        if self.record is not None:
+            self.record.append(text)
 
-                if used.get(payload):
-                    continue
+    def add_data(self, ctype, values):
+        """Adds a constant array stored in flash memory (``PROGMEM``) to the
+        sketch. Identical arrays are added only once
 
-                used[payload] = True
-                for depend in payload.depends:
-                    payloads.append(depend)
+        Args:
+            ctype (str): C++ type of the array items, e.g. ``uint16_t``
+            values (str): comma separated items of the array
 
-            for payload in used:
-                self.payloads.add(payload)
+        Returns:
+            str: name of the array
+        """
+        digest = blake2b(f'{ctype} {values}'.encode(), digest_size=16).digest()
+        name = self.data_names.get(digest)
+
+        if name is None:
+            name = self.data_names[digest] = f'data{len(self.data_names)}'
+            self.add_rendered_data(f'const {ctype} {name}[] PROGMEM = {{{values}}};\n')
+
+        return name
+
+    def add_rendered_data(self, text):
+        """Adds already rendered declarations of constant data
+
+        Args:
+            text (str): Text to add
+        """
+        self.data.write(text)
+
+        if self.record_data is not None:
+            self.record_data.append(text)
+
+    def add_payload(self, payload):
+        """Adds a payload to the current sketch
+
+        Args:
+            payload (pparser.payloads.Payload): payload to add
+        """
+        if payload:
+            self.payloads.update(payload_closure(payload))
 
     def fprint(self, string='', *args, **kwargs):
         """Writes text to a file. Is an alias of the print function
         """
         print(string, file=self.file, *args, **kwargs)
 
-    def make_indents(self, constructions, level=0, indented=None):
-        """Turns a nested list into an indented text. Works recursively for
-        each list
+    def make_indents(self, constructions, level=0):
+        """Turns a nested list into an indented text. Nested lists are
+        walked with an explicit stack, so deep nesting is fine
 
         Args:
             constructions (List[Union[List, str]]): nested list describing
                 C++ sources
+            level (int): indentation level of the outer list
 
         Returns:
-            str: indented C++ sources
+            List[str]: indented lines of C++ sources
         """
-        if indented is None:
-            indented = []
-
-        for construction in constructions:
-            if isinstance(construction, str):
-                indented.append(self.indent * level + construction)
+        indented = []
+        stack = [(iter(constructions), level)]
+
+        while stack:
+            constructions, level = stack[-1]
+
+            for construction in constructions:
+                if isinstance(construction, str):
+                    indented.append(self.indent * level + construction)
+                else:
+                    stack.append((iter(construction), level + 1))
+                    break
             else:
-                self.make_indents(construction, level + 1, indented)
+                stack.pop()
 
         return indented
 
+    def render_payload(self, payload, strip=False):
+        """Renders the definition of the payload. Rendered definitions are
+        kept in memory for each indent width, so they are rendered only once
+        per process
+
+        Args:
+            payload (pparser.payloads.Payload): payload to render
+            strip (bool): whether the defaulted ``delayTec`` parameter is removed
+
+        Returns:
+            str: indented C++ sources of the payload
+        """
+        key = (payload, self.indent, strip)
+        text = _rendered_payloads.get(key)
+
+        if text is None:
+            sources = strip_delay(payload.text) if strip else payload.text
+            text = _rendered_payloads[key] = '\n'.join(self.make_indents(sources)) + '\n'
+
+        return text
+
     def flush(self):
         """Generates the final sketch (with all the paylods and commands)
         and writes it to a file
@@ -112,9 +268,21 @@ class Sketch:
 
 // Payload headers''')
 
+        payloads = payload_order(self.payloads)
+
+        # Payloads, from which the unused parameter is removed
+        specializer = self.specializer
+        strips = [specializer is not None and specializer.strips(payload) for payload in payloads]
+
         # Write payload headers
-        for payload in self.payloads:
-            self.fprint(payload.header)
+        for payload, strip in zip(payloads, strips):
+            self.fprint(strip_delay(payload.header) if strip else payload.header)
+
+        # Write constant data
+        if self.data_names:
+            self.fprint('\n\n// Payload data')
+            self.data.seek(0)
+            copyfileobj(self.data, self.file)
 
         # Write `setup` funcition with parsed commands
         self.fprint(f'''
@@ -127,8 +295,9 @@ void setup() {{
 
 {self.indent}// Start of payload''')
 
-        for line in self.make_indents(self.content):
-            self.fprint(line)
+        # Splice the streamed body of `setup`
+        self.body.seek(0)
+        copyfileobj(self.body, self.file)
 
         self.fprint(f'''
 {self.indent}// De-initialize keyboard library
@@ -141,7 +310,155 @@ void loop() {{ }}
 // Payload definitions''')
 
         # Write payloads
-        for payload in self.payloads:
-            for line in self.make_indents(payload.text):
-                self.fprint(line)
-            self.fprint()
+        for payload, strip in zip(payloads, strips):
+            self.fprint(self.render_payload(payload, strip))
+
+
+class CppEmitter:
+    """Renders IR nodes (see :mod:`pparser.ir`) to C++ and adds them to the
+    sketch together with the payloads they require
+
+    Args:
+        sketch (Sketch): the output sketch
+        translator (Union[pparser.alphabet.AltTranslator, None]): translator
+            of Alt codes, ``None`` if they are disabled
+        progmem (bool): whether strings are stored in flash memory
+    """
+
+    # Payloads which print Alt codes in each encoding: (payload, payload
+    # which reads codes from flash memory, type of the array items)
+    alt_payloads = {
+        'u16': (printAltString, printAltStringP, 'uint16_t'),
+        'u8': (printAltString8, printAltString8P, 'uint8_t'),
+        'keys': (printAltKeys, printAltKeysP, 'uint8_t')
+    }
+
+    def __init__(self, sketch, translator, progmem):
+        self.sketch = sketch
+        self.translator = translator
+        self.progmem = progmem
+        self.specializer = sketch.specializer
+
+    def add(self, nodes):
+        """Renders nodes and adds them to the sketch
+
+        Args:
+            nodes (list): IR nodes, the code in the special format (see
+                :class:`pparser.payloads.Payload`) is added as is
+        """
+        if nodes:
+            self.sketch.add_text(self.render(nodes))
+
+    def render(self, nodes):
+        """Renders nodes to the code in the special format (see
+        :class:`pparser.payloads.Payload`)
+
+        Args:
+            nodes (list): IR nodes or already rendered code
+
+        Returns:
+            list: rendered code
+        """
+        text = []
+        renderers = self.renderers
+
+        for node in nodes:
+            renderer = renderers.get(type(node))
+
+            if renderer is not None:
+                text.append(renderer(self, node))
+            elif isinstance(node, Loop):
+                text += [f'for (short i = 0; i < {node.n}; ++i) {{', self.render(node.body), '}']
+            elif isinstance(node, Node):
+                raise TypeError(f'unknown IR node `{type(node).__name__}`')
+            else:
+                text.append(node)
+
+                if self.specializer is not None:
+                    self.specializer.raw = True
+
+        return text
+
+    def add_payload(self, payload):
+        """Adds the payload to the sketch, if it isn't added yet
+        """
+        if payload not in self.sketch.payloads:
+            self.sketch.add_payload(payload)
+
+    def render_delay(self, node):
+        return f'delay({node.ms});'
+
+    def render_press(self, node):
+        self.add_payload(pressSingleKey)
+        return f'pressSingleKey({node.key});'
+
+    def add_shared(self, template, function, ctype, values):
+        """Adds the constant array for the specialized call of the payload
+        (see :class:`pparser.specializer.Specializer`)
+
+        Args:
+            template (pparser.payloads.Payload): template called without
+                specialization
+            function (pparser.payloads.Payload): function called instead
+            ctype (str): C++ type of the array items
+            values (str): comma separated items of the array
+
+        Returns:
+            Tuple[str, int]: name and length of the array
+        """
+        n = len(self.sketch.data_names)
+        name = self.sketch.add_data(ctype, values)
+        length = values.count(',') + 1
+
+        self.specializer.call(template, function, length, 2 if ctype == 'uint16_t' else 1, len(self.sketch.data_names) > n)
+        return name, length
+
+    def render_combo(self, node):
+        if self.specializer is not None:
+            self.add_payload(pressComboKeyP)
+            name, length = self.add_shared(pressComboKey, pressComboKeyP, 'uint8_t', ', '.join(node.keys))
+            return f'pressComboKeyP({name}, {length});'
+
+        self.add_payload(pressComboKey)
+        return f"pressComboKey({{{', '.join('(uint8_t)' + key for key in node.keys)}}});"
+
+    def render_text(self, node):
+        delay = '' if node.delay is None else f', {node.delay}'
+        text = node.text.replace('\\', '\\\\').replace('"', '\\"')
+        payload = printDefaultStringP if self.progmem else printDefaultString
+
+        if self.specializer is not None:
+            self.specializer.delay(payload, node.delay)
+
+        self.add_payload(payload)
+        return f'{payload.__name__}(F("{text}"){delay});'
+
+    def render_alt(self, node):
+        delay = '' if node.delay is None else f', {node.delay}'
+        payload, payload_p, ctype = self.alt_payloads[self.translator.encoding]
+
+        if self.specializer is not None:
+            self.specializer.delay(payload_p, node.delay)
+
+            if not self.progmem:
+                self.add_payload(payload_p)
+                name, length = self.add_shared(payload, payload_p, ctype, self.translator.render_data(node.codes))
+                return f'{payload_p.__name__}({name}, {length}{delay});'
+
+        if self.progmem:
+            self.add_payload(payload_p)
+            values = self.translator.render_data(node.codes)
+            name = self.sketch.add_data(ctype, values)
+            return f'{payload_p.__name__}({name}, {values.count(",") + 1}{delay});'
+
+        self.add_payload(payload)
+        return f'{payload.__name__}({{{self.translator.render(node.codes)}}}{delay});'
+
+    # Renderers of simple nodes (which aren't `Loop`)
+    renderers = {
+        Delay: render_delay,
+        Press: render_press,
+        Combo: render_combo,
+        TypeText: render_text,
+        TypeAlt: render_alt
+    }
@@ -0,0 +1,173 @@
+"""File containing the specialization stage of the sketch, which reduces
+the size of the compiled sketch in flash memory
+"""
+
+from .payloads import *
+
+
+# Approximate size in bytes of each function compiled by avr-gcc for
+# ATmega32u4. Templates are instantiated for each length of the array
+_function_size = {
+    pressComboKey: 36,
+    pressComboKeyP: 44,
+    printAltString: 120,
+    printAltStringP: 130,
+    printAltString8: 116,
+    printAltString8P: 124,
+    printAltKeys: 70,
+    printAltKeysP: 78
+}
+
+# Approximate size in bytes of the call which builds a temporary array (it's
+# copied from initialized data to the stack) and of the call which passes
+# a pointer and a length
+_array_call = 18
+_pointer_call = 10
+
+# Size of passing of the defaulted `delayTec` parameter and of the call
+# of `delay` in the body of the function, which uses it
+_default_arg = 4
+_delay_body = 8
+
+
+def strip_delay(text):
+    """Removes the defaulted ``delayTec`` parameter from the sources of the
+    payload (header or text in the special format, see :class:`pparser.payloads.Payload`)
+
+    Args:
+        text (Union[List, str]): sources of the payload
+
+    Returns:
+        Union[List, str]: sources without the parameter
+    """
+    if isinstance(text, str):
+        return text.replace(', int delayTec = 0', '').replace(', int delayTec', '')
+
+    return [strip_delay(line) for line in text if line != 'delay(delayTec);']
+
+
+class Specializer:
+    """Link-aware specialization of the sketch. Payloads ``pressComboKey``
+    and ``printAltString`` (and other encodings of Alt codes) are templates
+    on the length of the array, so each distinct length creates a separate
+    instantiation and each call builds its own temporary array. Instead,
+    specialized calls pass a pointer and a length of the shared constant
+    array stored in flash memory, so there is only one function for all of
+    them. It's used by :class:`pparser.sketch.CppEmitter`, when it's
+    assigned to the sketch
+
+    Defaulted ``delayTec`` parameter of payloads is removed, if no call
+    passes it. Code generated by custom commands directly (not by IR nodes)
+    can call payloads with any arguments, so nothing is removed then
+    """
+
+    def __init__(self):
+        # Instantiations of templates, which the specialized calls would
+        # require, and the functions which are used instead
+        self.templates = set()
+        self.functions = set()
+
+        # Number of specialized calls, size of their temporary arrays and
+        # size of the shared arrays in bytes
+        self.calls = 0
+        self.array_bytes = 0
+        self.shared_bytes = 0
+
+        # Number of calls of payloads with the `delayTec` parameter and
+        # payloads to which it's passed
+        self.delay_calls = {}
+        self.delays = set()
+
+        # Whether custom commands have generated code directly
+        self.raw = False
+
+    def call(self, template, function, length, size, shared):
+        """Records the specialized call
+
+        Args:
+            template (pparser.payloads.Payload): template called without
+                specialization
+            function (pparser.payloads.Payload): function called instead
+            length (int): length of the array
+            size (int): size of the array items in bytes
+            shared (bool): whether the array is added to the sketch by this
+                call, otherwise the same array is already shared
+        """
+        self.templates.add((template, length))
+        self.functions.add(function)
+        self.calls += 1
+        self.array_bytes += length * size
+
+        if shared:
+            self.shared_bytes += length * size
+
+    def delay(self, payload, delay):
+        """Records the call of the payload with the ``delayTec`` parameter
+
+        Args:
+            payload (pparser.payloads.Payload): called payload
+            delay (Union[int, None]): passed delay per character
+        """
+        self.delay_calls[payload] = self.delay_calls.get(payload, 0) + 1
+
+        if delay is not None:
+            self.delays.add(payload)
+
+    def strips(self, payload):
+        """Checks whether the ``delayTec`` parameter is removed from the payload
+        """
+        return not self.raw and payload in self.delay_calls and payload not in self.delays
+
+    def report(self):
+        """Estimates flash size of the specialized payloads and their calls
+
+        Returns:
+            Tuple[int, int]: size in bytes before and after specialization
+        """
+        before = sum(_function_size[template] for template, _ in self.templates)
+        before += self.calls * _array_call + self.array_bytes
+
+        after = sum(_function_size[function] for function in self.functions)
+        after += self.calls * _pointer_call + self.shared_bytes
+
+        for payload, calls in self.delay_calls.items():
+            before += calls * _default_arg
+            after += 0 if self.strips(payload) else calls * _default_arg + _delay_body
+
+            # Function isn't specialized, so its body is counted here
+            before += _delay_body
+
+        return before, after
+
+    def summary(self):
+        """Returns the summary of the specialization
+
+        Returns:
+            List[str]: lines of the summary
+        """
+        before, after = self.report()
+        stripped = sum(map(self.strips, self.delay_calls))
+        templates, functions = len(self.templates), len(self.functions)
+
+        return [
+            f'Specialized {self.calls} call{"s" * (self.calls != 1)}: {templates} template instantiation{"s" * (templates != 1)} '
+            f'replaced with {functions} function{"s" * (functions != 1)}, {stripped} unused parameter{"s" * (stripped != 1)} removed',
+            f'Estimated flash of specialized payloads: {before} bytes before, {after} bytes after ({before - after} bytes saved)'
+        ]
+
+    def get_state(self):
+        """Returns the state of the specializer (see :meth:`pparser.parser.PotatoParser.get_state`)
+        """
+        return (set(self.templates), set(self.functions), self.calls, self.array_bytes,
+                self.shared_bytes, dict(self.delay_calls), set(self.delays), self.raw)
+
+    def set_state(self, state):
+        """Restores the state of the specializer returned by :meth:`get_state`
+        """
+        (templates, functions, self.calls, self.array_bytes,
+         self.shared_bytes, delay_calls, delays, self.raw) = state
+
+        self.templates = set(templates)
+        self.functions = set(functions)
+        self.delay_calls = dict(delay_calls)
+        self.delays = set(delays)
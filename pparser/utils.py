@@ -1,18 +1,44 @@
 """File containing auxiliary functions
 """
 
+from pathlib import Path
 from sys import exit
+import os
 
 from colorama import Style, Fore
 
 
+def format_error(msg):
+    """Formats error message for console (see :func:`log_error`)
+
+    Args:
+        msg (str): message to format
+
+    Returns:
+        str: formatted message
+    """
+    return f'{Style.BRIGHT}{Fore.RED}[!]{Style.RESET_ALL} {msg}'
+
+
+def format_info(msg):
+    """Formats info message for console (see :func:`log_info`)
+
+    Args:
+        msg (str): message to format
+
+    Returns:
+        str: formatted message
+    """
+    return f'{Style.BRIGHT}{Fore.BLACK}[*] {msg}{Style.RESET_ALL}'
+
+
 def log_error(msg):
     """Logs error message to console
 
     Args:
         msg (str): message to log
     """
-    print(f'{Style.BRIGHT}{Fore.RED}[!]{Style.RESET_ALL} {msg}')
+    print(format_error(msg))
 
 
 def log_info(msg):
@@ -21,7 +47,7 @@ def log_info(msg):
     Args:
         msg (str): message to log
     """
-    print(f'{Style.BRIGHT}{Fore.BLACK}[*] {msg}{Style.RESET_ALL}')
+    print(format_info(msg))
 
 
 def log_success(msg):
@@ -45,3 +71,31 @@ def check_file(path):
 
     log_error(f"File `{path}` doesn't exist")
     exit(1)
+
+
+def cache_dir():
+    """Returns path to the directory for the cache files of PotatoParser. It
+    can be redefined with the ``PPARSER_CACHE_DIR`` environment variable
+
+    Returns:
+        pathlib.Path: path to the cache directory (it may not exist)
+    """
+    if os.environ.get('PPARSER_CACHE_DIR'):
+        return Path(os.environ['PPARSER_CACHE_DIR'])
+
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+
+    return Path(base) / 'pparser'
+
+
+def checkpoints_dir():
+    """Returns the default directory of checkpoints of incremental parsing
+    (see ``--cache`` option), it's private to the user
+
+    Returns:
+        pathlib.Path: path to the directory (it may not exist)
+    """
+    return cache_dir() / 'checkpoints'
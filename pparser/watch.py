@@ -0,0 +1,173 @@
+"""File containing the watch mode, which recompiles the script each time
+it's changed
+"""
+
+from time import perf_counter, sleep
+import os
+import pickle
+
+from .alphabet import default_alphabets, load_alphabet
+from .cache import CompilationCache
+from .exceptions import AlphabetError
+from .layout import layout_path
+from .main import compile_script
+from .utils import log_error, log_info, log_success
+
+
+# Interval between checks of the watched files in seconds
+poll_interval = 0.1
+
+
+class MemoryCache(CompilationCache):
+    """Checkpoints of the watched script, which are kept in memory between
+    recompilations (see :class:`pparser.cache.CompilationCache`). Only
+    checkpoints of the last compiled version of the script are kept, so
+    memory usage doesn't grow with the number of changes
+
+    The state of the parser is pickled anyway, because the parser keeps
+    changing it after the checkpoint. It's unpickled only if parsing is
+    resumed from this checkpoint, the rest of checkpoints are just replayed
+    """
+
+    # Checkpoints are cheaper than on disk, so they are more frequent and
+    # fewer lines are parsed again after the change
+    interval = 250
+
+    def __init__(self):
+        self.entries = {}
+
+        # Keys of checkpoints of the current compilation
+        self.used = set()
+
+        # Number of checkpoints restored by the current compilation
+        self.hits = 0
+
+        self._options_key = None
+
+    def options_key(self, pparser):
+        """Generates key of the parser options (see :meth:`pparser.cache.CompilationCache.options_key`).
+        It's generated once, because options don't change while watching,
+        and the cache is recreated if alphabets or the layout are changed
+        """
+        if self._options_key is None:
+            self._options_key = CompilationCache.options_key(pparser)
+
+        return self._options_key
+
+    def load(self, key):
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            self.used.add(key)
+            self.hits += 1
+
+        return entry
+
+    def store(self, key, entry):
+        self.entries[key] = {**entry, 'state': pickle.dumps(entry['state'], pickle.HIGHEST_PROTOCOL)}
+        self.used.add(key)
+
+    def restore(self, pparser, state):
+        pparser.set_state(pickle.loads(state))
+
+    def clear(self):
+        self.entries.clear()
+
+    def trim(self):
+        """Removes checkpoints of the previous versions of the script
+        """
+        self.entries = {key: self.entries[key] for key in self.used}
+        self.used = set()
+
+
+def _stat(path):
+    """Returns modification time and size of the file, or ``None`` if it
+    doesn't exist (e.g. while the editor replaces it)
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def recompile(args, alphabet, cache):
+    """Compiles the script with checkpoints of the previous compilation and
+    reports its latency
+
+    Args:
+        args (argparse.Namespace): parser options
+        alphabet (Union[dict, None]): loaded alphabet of Alt codes
+        cache (MemoryCache): checkpoints of the previous compilation
+    """
+    start = perf_counter()
+    cache.hits = 0
+
+    try:
+        pparser = compile_script(args, alphabet, cache=cache)
+    except SystemExit:
+        # Errors are already logged, the next change is waited anyway
+        log_error(f'Compilation failed in {(perf_counter() - start) * 1000:.1f}ms')
+        return
+
+    # The parser is referenced by its commands, so the sketch isn't closed
+    # as soon as it's not used
+    pparser.sketch.file.close()
+
+    reused = min(cache.hits * cache.interval, pparser.i)
+    log_success(f'Compiled {pparser.i} line{"s" * (pparser.i != 1)} in {(perf_counter() - start) * 1000:.1f}ms ({reused} reused)')
+
+
+def watch(args, alphabet):
+    """Compiles the script **args.source** and recompiles it each time when
+    it, alphabets or the keyboard layout are changed, until it's interrupted
+    by Ctrl+C. Files are checked by their modification time and size, only
+    lines after the first changed one are parsed again (see :class:`MemoryCache`)
+
+    Args:
+        args (argparse.Namespace): parser options
+        alphabet (Union[dict, None]): already loaded alphabet of Alt codes
+    """
+    # Files which change the options of the parser, so checkpoints are
+    # dropped when they're changed
+    option_files = [] if args.disable_alt else [*default_alphabets, *args.alphabets]
+
+    if args.layout and not args.disable_alt:
+        option_files.append(layout_path(args.layout))
+
+    options = [_stat(path) for path in option_files]
+    source = None
+    cache = MemoryCache()
+
+    log_info(f'Watching `{args.source}`, press Ctrl+C to stop')
+
+    try:
+        while True:
+            current = [_stat(path) for path in option_files]
+
+            if current != options:
+                options = current
+                source = None
+                cache = MemoryCache()
+
+                try:
+                    alphabet = None if args.disable_alt else load_alphabet(args.alphabets)
+                except SystemExit:
+                    # Alphabet is missing, so the script is compiled again
+                    # when it's restored
+                    alphabet = None
+                except AlphabetError as e:
+                    # The same, until the alphabet is fixed
+                    log_error(str(e))
+                    alphabet = None
+
+            current = _stat(args.source)
+
+            if current is not None and current != source and (alphabet is not None or args.disable_alt):
+                source = current
+                recompile(args, alphabet, cache)
+
+            sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,84 @@
+"""Fixtures shared by the tests
+"""
+
+import pytest
+
+from pparser.main import build_arg_parser, compile_script
+from pparser.parser import PotatoParser
+
+
+def _parse(lines, *options):
+    """Parses the lines to the sketch in memory
+
+    Returns:
+        pparser.parser.PotatoParser: parser which has processed the lines
+    """
+    args = build_arg_parser().parse_args(['-e', *options, '-'])
+    args.output = None
+
+    pparser = PotatoParser(args)
+
+    for line in lines:
+        pparser.exec_line(line)
+
+    pparser.sketch.flush()
+    return pparser
+
+
+@pytest.fixture
+def parse():
+    """Function which parses the lines with the command-line options to the
+    sketch in memory
+    """
+    return _parse
+
+
+def _compile(source, output, *options, cache=None):
+    """Compiles the script file to the sketch directory as the command-line
+    interface does
+
+    Returns:
+        Tuple[str, list]: text of the sketch and diagnostics in format
+            ``(level, code, line, column, message)``
+    """
+    args = build_arg_parser().parse_args(['-e', '-o', str(output), *options, str(source)])
+    args.source = source
+
+    pparser = compile_script(args, cache=cache)
+    pparser.sketch.file.close()
+
+    with open(output / (output.name + '.ino'), encoding='utf-8') as file:
+        sketch = file.read()
+
+    return sketch, [(d.level, d.code, d.line, d.column, d.message) for d in pparser.diagnostics]
+
+
+@pytest.fixture
+def compile(tmp_path, monkeypatch):
+    """Function which compiles the script file to the sketch and returns the
+    sketch with diagnostics. The user cache directory is temporary
+    """
+    monkeypatch.setenv('PPARSER_CACHE_DIR', str(tmp_path / 'user-cache'))
+    return _compile
+
+
+@pytest.fixture
+def script():
+    """Lines of the script, which is long enough for several checkpoints and
+    has errors and warnings
+    """
+    lines = []
+
+    for i in range(3500):
+        if i % 7 == 0:
+            lines.append(f'STRING line {i}')
+        elif i % 7 == 1:
+            lines.append('DELAY 10')
+        elif i % 7 == 2:
+            lines.append(f'BOGUS {i}')
+        elif i % 7 == 3:
+            lines.append('REPEAT 2')
+        else:
+            lines.append(['ENTER', 'TAB', f'STRINGDELAY 5 text {i % 13}'][i % 3])
+
+    return lines
@@ -0,0 +1,29 @@
+"""Tests of incremental parsing with the on-disk cache of checkpoints
+"""
+
+import pytest
+
+from pparser.cache import CompilationCache
+
+
+@pytest.mark.parametrize('options', [[], ['-O2', '--progmem']])
+def test_cached_builds_match_uncached(tmp_path, compile, script, options):
+    source = tmp_path / 'script.txt'
+    cache = tmp_path / 'cache'
+
+    def check(lines):
+        source.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+        expected = compile(source, tmp_path / 'plain' / 'sketch', *options)
+        assert expected[1]
+
+        cached = compile(source, tmp_path / 'cached' / 'sketch', *options, cache=CompilationCache(cache, 1 << 30))
+        assert cached == expected
+
+    # Cold build, build after the change in the middle and unchanged rerun,
+    # which replays checkpoints stored after the change
+    check(script)
+
+    script[1500] = 'STRING edited'
+    check(script)
+    check(script)
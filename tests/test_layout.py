@@ -0,0 +1,25 @@
+"""Tests of the mixed typing mode with keyboard layouts
+"""
+
+from pparser.commands import STRING, _print_string
+from pparser.ir import TypeAlt, TypeText
+
+
+def nodes(parse, text, layout):
+    """Returns nodes generated by **STRING** with the layout
+    """
+    pparser = parse([], '--layout', layout)
+    return [
+        (node.__class__, node.text if isinstance(node, TypeText) else None)
+        for node in _print_string(STRING(text, pparser), text)
+    ]
+
+
+def test_characters_replaced_by_keys(parse):
+    assert nodes(parse, 'Привет, мир', 'ru') == [(TypeText, 'Ghbdtn? vbh')]
+
+
+def test_short_runs_typed_by_alt_codes(parse):
+    # Lone space between Alt codes isn't a separate segment
+    assert nodes(parse, 'мир мир', 'us') == [(TypeAlt, None)]
+    assert nodes(parse, 'мир, hello world', 'us') == [(TypeAlt, None), (TypeText, ', hello world')]
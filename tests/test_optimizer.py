@@ -0,0 +1,18 @@
+"""Tests of the optimizers of the generated code
+"""
+
+
+def test_optimizer_with_loop_compression(parse):
+    # Key presses which aren't compressed to loops are mixed with strings
+    # and delays, which can be merged
+    lines = ['STRING hello', 'STRING world', 'ENTER', 'DELAY 10', 'DELAY 20', 'TAB'] * 40
+
+    for i in range(100):
+        lines += [f'STRING line {i}', 'STRING !', 'ENTER', 'DELAY 10', 'DELAY 20']
+
+    alone = parse(lines, '-O2')
+    compressed = parse(lines, '-O2', '--compress-loops')
+
+    assert compressed.compressor.loops > 0
+    assert compressed.optimizer.statements > 0
+    assert compressed.optimizer.statements >= alone.optimizer.statements // 2
@@ -0,0 +1,35 @@
+"""Tests of startup time of the command-line interface
+"""
+
+import re
+import subprocess
+import sys
+
+from pparser.bench import run_startup
+
+
+# Maximum import time of the command-line interface in milliseconds, the
+# same as the default of `pparser bench --startup-budget`
+startup_budget = 100
+
+# Modules which are imported only when the options need them
+lazy_modules = ['pparser.cache', 'pparser.chunked', 'pparser.optimizer', 'pparser.server', 'concurrent.futures']
+
+
+def test_heavy_modules_are_lazy():
+    r = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'pparser', '-q'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True
+    )
+
+    imported = set(re.findall(r'\|\s*(\S+)$', r.stderr, re.M))
+
+    assert 'pparser.main' in imported
+    assert not imported.intersection(lazy_modules)
+
+
+def test_startup_within_budget():
+    # The first run may compile bytecode, so the best of several runs is taken
+    import_ms = min(run_startup()['import_ms'] for _ in range(3))
+
+    assert 0 < import_ms <= startup_budget
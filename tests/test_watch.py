@@ -0,0 +1,32 @@
+"""Tests of recompilation in the watch mode
+"""
+
+from pparser.main import build_arg_parser
+from pparser.watch import MemoryCache, recompile
+
+
+def test_recompilations_match_uncached(tmp_path, compile, script):
+    source = tmp_path / 'script.txt'
+    output = tmp_path / 'watched' / 'sketch'
+
+    args = build_arg_parser().parse_args(['-e', '-o', str(output), str(source)])
+    args.source = source
+    cache = MemoryCache()
+
+    # Change in the middle, appended line, unchanged script and change near
+    # the beginning, all recompiled with checkpoints of the previous version
+    edits = [None, (1500, 'STRING edited'), (len(script), 'STRING appended'), None, (10, 'DELAY 20')]
+
+    for edit in edits:
+        if edit is not None:
+            i, line = edit
+            script[i:i + 1] = [line]
+
+        source.write_text('\n'.join(script) + '\n', encoding='utf-8')
+
+        recompile(args, None, cache)
+
+        with open(output / 'sketch.ino', encoding='utf-8') as file:
+            sketch = file.read()
+
+        assert sketch == compile(source, tmp_path / 'plain' / 'sketch')[0]